@@ -0,0 +1,136 @@
+"""
+Host blocklist for SERP candidates: reversed-label trie with rules loadable from a file
+"""
+import logging
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+
+import tldextract
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# A blocked domain also blocks its subdomains; a blocked brand matches under any public suffix
+# (indeed.fr, glassdoor.co.uk); a blocked leading label matches news.example.com
+DEFAULT_BLOCK_DOMAINS = {
+    "linkedin.com", "facebook.com", "instagram.com", "twitter.com", "x.com", "youtube.com", "tiktok.com",
+    "wikipedia.org", "wikidata.org", "crunchbase.com", "rocketreach.co", "apollo.io", "zoominfo.com",
+    "ycombinator.com", "angel.co", "medium.com", "pinterest.com", "reddit.com",
+    "societe.com", "pappers.fr", "infogreffe.fr", "verif.com", "manageo.fr", "kompass.com", "dnb.com",
+    "opencorporates.com", "northdata.com", "northdata.de", "bloomberg.com", "owler.com", "craft.co",
+    "cbinsights.com", "pitchbook.com", "dealroom.co", "f6s.com", "trustpilot.com", "yelp.com",
+    "pagesjaunes.fr", "annuaire-entreprises.data.gouv.fr", "welcometothejungle.com", "lusha.com",
+    "signalhire.com", "contactout.com", "leadiq.com", "find-and-update.company-information.service.gov.uk",
+}
+DEFAULT_BLOCK_BRANDS = {"glassdoor", "indeed", "blogspot", "yellowpages"}
+DEFAULT_BLOCK_LEADING_LABELS = {"news"}
+
+_END = ""  # trie terminal marker (never a valid DNS label)
+
+
+@lru_cache(maxsize=65536)
+def _brand_label(host: str) -> str:
+    return tldextract.extract(host).domain.lower()
+
+
+class HostBlocklist:
+    """Lookup walks the host's labels right to left, so cost depends on the host, not on the list size.
+
+    File format, one rule per line ('#' and '!' start comments):
+      example.com | *.example.com | ||example.com^ | 0.0.0.0 example.com   block a domain and its subdomains
+      brand:glassdoor                                                    block a name under any public suffix
+      label:news                                                         block hosts whose first label matches
+    """
+
+    def __init__(self, domains: Iterable[str] = (), brands: Iterable[str] = (), leading_labels: Iterable[str] = ()):
+        self.root: dict = {}
+        self.brands = set()
+        self.leading_labels = set()
+        self.domain_count = 0
+        self.rejected = 0
+        for d in domains:
+            self.add_domain(d)
+        for b in brands:
+            self.brands.add(b.strip().lower())
+        for label in leading_labels:
+            self.leading_labels.add(label.strip().lower())
+
+    def add_domain(self, domain: str):
+        labels = [x for x in domain.strip().lower().strip(".").split(".") if x]
+        if not labels:
+            return
+        node = self.root
+        for label in reversed(labels):
+            node = node.setdefault(label, {})
+        if _END not in node:
+            node[_END] = {}
+            self.domain_count += 1
+
+    def add_rule(self, line: str):
+        rule = line.split("#", 1)[0].strip()
+        if not rule or rule.startswith("!"):
+            return
+        kind, _, value = rule.partition(":")
+        if value and kind in ("brand", "label"):
+            (self.brands if kind == "brand" else self.leading_labels).add(value.strip().lower())
+            return
+        parts = rule.split()
+        if len(parts) == 2 and parts[0] in ("0.0.0.0", "127.0.0.1"):
+            rule = parts[1]
+        rule = rule.removeprefix("||").removesuffix("^").removeprefix("*.")
+        if "/" in rule or " " in rule:
+            return
+        # "com" or "co.uk" would block every candidate under that suffix
+        ext = tldextract.extract(rule)
+        if not ext.domain and ext.suffix:
+            logger.warning(f"Ignoring blocklist rule {line.strip()!r}: it is a whole public suffix")
+            self.rejected += 1
+            return
+        self.add_domain(rule)
+
+    def load_file(self, path: Path) -> int:
+        before = self.domain_count + len(self.brands) + len(self.leading_labels)
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                self.add_rule(line)
+        return self.domain_count + len(self.brands) + len(self.leading_labels) - before
+
+    def is_blocked(self, host: str) -> bool:
+        labels = host.lower().strip(".").split(".")
+        node = self.root
+        for label in reversed(labels):
+            node = node.get(label)
+            if node is None:
+                break
+            if _END in node:
+                return True
+        if len(labels) > 2 and labels[0] in self.leading_labels:
+            return True
+        # Public-suffix parsing only when some label could be a blocked brand
+        if self.brands.isdisjoint(labels):
+            return False
+        return _brand_label(host) in self.brands
+
+    def __len__(self):
+        return self.domain_count + len(self.brands) + len(self.leading_labels)
+
+
+_default: Optional[HostBlocklist] = None
+_default_lock = threading.Lock()
+
+
+def default_blocklist() -> HostBlocklist:
+    """Built-in rules plus BLOCKLIST_FILE, compiled once per process"""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                bl = HostBlocklist(DEFAULT_BLOCK_DOMAINS, DEFAULT_BLOCK_BRANDS, DEFAULT_BLOCK_LEADING_LABELS)
+                if settings.BLOCKLIST_FILE:
+                    bl.load_file(Path(settings.BLOCKLIST_FILE))
+                _default = bl
+    return _default
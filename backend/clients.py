@@ -0,0 +1,98 @@
+"""
+Application-scoped HTTP clients shared by all jobs, lookups and the legal-page crawler
+"""
+import asyncio
+import threading
+import time
+from typing import Optional
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend.config import settings
+
+
+class ClientManager:
+    """Keeps warm keep-alive pools (with DNS caching) for Serper, OpenAI and the crawler.
+
+    aiohttp speaks HTTP/1.1 only, so reuse comes from keep-alive pools rather than HTTP/2 multiplexing.
+    """
+
+    def __init__(self):
+        self.serp: Optional[aiohttp.ClientSession] = None
+        self.openai: Optional[aiohttp.ClientSession] = None
+        self._crawler: Optional[requests.Session] = None
+        self._crawler_lock = threading.Lock()
+        self._loop = None
+        self._start_lock = None
+        self._openai_healthy_at = 0.0
+
+    @staticmethod
+    def _connector(limit: int) -> aiohttp.TCPConnector:
+        return aiohttp.TCPConnector(
+            limit=limit,
+            ttl_dns_cache=settings.CLIENT_DNS_CACHE_TTL,
+            keepalive_timeout=settings.CLIENT_KEEPALIVE_SEC,
+            ssl=False,
+        )
+
+    @property
+    def started(self) -> bool:
+        return self.serp is not None and not self.serp.closed
+
+    async def start(self):
+        """Open the shared sessions (idempotent; reopens them if the event loop changed)"""
+        loop = asyncio.get_running_loop()
+        if self.started and self._loop is loop:
+            return
+        if self._start_lock is None or self._loop is not loop:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.started and self._loop is loop:
+                return
+            if self._loop is not loop:
+                # Sessions bound to a previous loop cannot be reused or awaited here
+                self.serp = self.openai = None
+            self._loop = loop
+            self.serp = aiohttp.ClientSession(connector=self._connector(settings.SERP_CONCURRENCY * 2))
+            self.openai = aiohttp.ClientSession(connector=self._connector(settings.OPENAI_CONCURRENCY * 2))
+
+    async def close(self):
+        for s in (self.serp, self.openai):
+            if s is not None and not s.closed:
+                await s.close()
+        self.serp = self.openai = None
+        with self._crawler_lock:
+            if self._crawler is not None:
+                self._crawler.close()
+                self._crawler = None
+
+    def crawler(self) -> requests.Session:
+        """Thread-safe lazily created requests.Session with a large per-host pool"""
+        if self._crawler is None:
+            with self._crawler_lock:
+                if self._crawler is None:
+                    s = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=settings.CRAWL_POOL_HOSTS,
+                                          pool_maxsize=settings.CRAWL_POOL_MAXSIZE)
+                    s.mount("http://", adapter)
+                    s.mount("https://", adapter)
+                    if settings.CRAWL_PROXY_URL:
+                        s.proxies = {"http": settings.CRAWL_PROXY_URL, "https": settings.CRAWL_PROXY_URL}
+                    self._crawler = s
+        return self._crawler
+
+    # OpenAI health, so jobs can skip the preflight round-trip
+    def mark_openai_healthy(self):
+        self._openai_healthy_at = time.monotonic()
+
+    def mark_openai_unhealthy(self):
+        self._openai_healthy_at = 0.0
+
+    def openai_recently_healthy(self) -> bool:
+        return (self._openai_healthy_at > 0
+                and time.monotonic() - self._openai_healthy_at < settings.OPENAI_HEALTH_TTL_SEC)
+
+
+client_manager = ClientManager()
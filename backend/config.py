@@ -29,6 +29,17 @@ class Settings(BaseSettings):
     OPENAI_URL: str = "https://api.openai.com/v1/chat/completions"
     SERPER_SEARCH_URL: str = "https://google.serper.dev/search"
 
+    # Search providers: comma list of name[:weight] among serper, http (Serper-compatible endpoint) and local
+    # (knowledge index); throttled providers cool down and queries fail over to the next one
+    SEARCH_PROVIDERS: str = "serper"
+    SEARCH_HTTP_URL: str = ""
+    SEARCH_HTTP_API_KEY: str = ""
+    SEARCH_HTTP_KEY_HEADER: str = "X-API-KEY"
+    SEARCH_HTTP_RESULTS_KEY: str = "organic"
+    SEARCH_FAILOVER_RETRIES: int = 1  # attempts on a provider before failing over (the last provider keeps MAX_RETRIES)
+    SEARCH_PROVIDER_COOLDOWN_SEC: float = 30.0
+    SEARCH_RACE_LOOKUPS: bool = False  # /api/lookup queries the two first providers at once
+
     SERP_MAX_RPS: int = 50
     SERP_CONCURRENCY: int = 100
     OPENAI_CONCURRENCY: int = 24
@@ -37,12 +48,118 @@ class Settings(BaseSettings):
     MAX_RETRIES: int = 4
     BACKOFF_BASE: float = 1.6
 
+    # Model cascade: rows go to OPENAI_FAST_MODEL first and unsure answers are escalated to OPENAI_MODEL
+    # (empty = single model)
+    OPENAI_FAST_MODEL: str = ""
+    CASCADE_ESCALATE_AMBIGUITY: int = 3  # escalate when this many candidates look like the same brand
+    OPENAI_STRUCTURED_OUTPUT: bool = True  # JSON-schema response_format; models rejecting it fall back to the prompt
+    OPENAI_PARSE_RETRIES: int = 1  # re-asks after an answer fails validation
+
     MAX_CANDIDATES_PER_COMPANY: int = 8
+    PROMPT_TOKEN_BUDGET: int = 700  # approximate user-prompt size sent to openai_choose
+    BLOCKLIST_FILE: str = ""  # extra directory/aggregator host rules, one per line (see backend/blocklist.py)
     SEARCH_RESULTS_PER_CALL: int = 12
     CHECKPOINT_EVERY: int = 20
     ENABLE_DNS_CHECK: bool = False
     DNS_TIMEOUT_SEC: int = 3
 
+    # Deadlines on time spent inside provider calls / crawls per row (slot waits and pauses excluded); 0 disables
+    ROW_DEADLINE_SEC: float = 180.0
+    SERP_DEADLINE_SEC: float = 60.0
+    LLM_DEADLINE_SEC: float = 90.0
+    CRAWL_DEADLINE_SEC: float = 60.0
+
+    # Hedged requests: duplicate a provider call still running after its recent p95 latency
+    HEDGE_ENABLED: bool = False
+    HEDGE_QUANTILE: float = 0.95
+    HEDGE_MAX_RATE: float = 0.05  # hedges per request, per provider tag
+    HEDGE_MIN_DELAY_SEC: float = 0.25
+    HEDGE_WINDOW: int = 500
+    HEDGE_MIN_SAMPLES: int = 50
+
+    # Stage pipeline for jobs: search -> LLM decision -> validation/crawl + write, each stage with its own
+    # workers and a bounded queue in front (0 = derive from the provider concurrency)
+    ENABLE_PIPELINE: bool = True
+    PIPELINE_SEARCH_WORKERS: int = 0
+    PIPELINE_LLM_WORKERS: int = 0
+    PIPELINE_FINALIZE_WORKERS: int = 16
+    PIPELINE_QUEUE_SIZE: int = 0  # 0 = twice the consuming stage's workers
+
+    # Deterministic pre-resolution (domain given in the row skips SERP + LLM)
+    ENABLE_PRERESOLVE: bool = True
+    PRERESOLVE_DNS_CHECK: bool = True
+    PRERESOLVE_SCORE: int = 90
+
+    # Local heuristic pre-ranking (skips the LLM when one candidate is unambiguous)
+    ENABLE_HEURISTIC_CHOICE: bool = True
+    HEURISTIC_ACCEPT_SCORE: int = 90
+    HEURISTIC_AUDIT_RATE: float = 0.0  # share of heuristic decisions also sent to the LLM to measure agreement
+
+    # Local company -> domain knowledge index (learned from completed jobs)
+    ENABLE_KNOWLEDGE_INDEX: bool = True
+    KNOWLEDGE_INDEX_PATH: Path = Path(os.environ.get('RESULTS_DIR', './data/results')) / "knowledge.sqlite3"
+    KNOWLEDGE_MIN_SCORE: int = 85  # results at or above this score (or with a registration match) are learned
+    KNOWLEDGE_FUZZY_MIN_RATIO: float = 0.92
+    KNOWLEDGE_FUZZY_CANDIDATES: int = 50
+    KNOWLEDGE_HIT_FLUSH_EVERY: int = 500  # hit counters are buffered in memory and written in batches
+
+    # Fair scheduling of SERP/OpenAI budgets across concurrent jobs
+    SCHED_WEIGHT_INTERACTIVE: float = 8.0
+    SCHED_WEIGHT_NORMAL: float = 2.0
+    SCHED_WEIGHT_BATCH: float = 1.0
+    SCHED_INTERACTIVE_MAX_ROWS: int = 1000
+    SCHED_BATCH_MIN_ROWS: int = 50000
+
+    # Shared HTTP clients
+    CLIENT_KEEPALIVE_SEC: int = 60
+    CLIENT_DNS_CACHE_TTL: int = 300
+    OPENAI_HEALTH_TTL_SEC: int = 300
+    CRAWL_POOL_HOSTS: int = 256
+    CRAWL_POOL_MAXSIZE: int = 16
+
+    # Legal-page crawler
+    CRAWL_BASE_URL: str = "https://{domain}"
+    CRAWL_PROXY_URL: str = ""
+    CRAWL_HOST_CONCURRENCY: int = 2  # requests in flight per host across all jobs
+    CRAWL_HOST_DELAY_SEC: float = 0.0  # minimum gap between request starts on one host (waits hold a crawl thread)
+    CRAWL_RESPECT_ROBOTS: bool = True
+    CRAWL_USER_AGENT: str = ""  # fixed crawler User-Agent, also matched in robots.txt (empty = one browser UA per host)
+    CRAWL_ROBOTS_TTL_SEC: int = 86400
+    CRAWL_DEAD_HOST_TTL_SEC: int = 900  # hosts that refused, failed to resolve or timed out are skipped this long
+    CRAWL_CANONICAL_TTL_SEC: int = 86400
+    CRAWL_HOST_CACHE_SIZE: int = 50000
+    CRAWL_USE_SITEMAPS: bool = True  # look for legal pages in robots.txt Sitemap: entries (else /sitemap.xml)
+    CRAWL_SITEMAP_MAX_FILES: int = 3  # sitemap files read per host, sitemap indexes included
+    CRAWL_SITEMAP_MAX_BYTES: int = 2_000_000
+    CRAWL_SITEMAP_TTL_SEC: int = 86400
+    CRAWL_HEAD_PROBE: bool = True  # HEAD guessed legal paths and only GET those that exist
+
+    # Export settings
+    EXPORT_FORMAT: str = "auto"  # auto (same as upload), csv, xlsx, parquet, jsonl
+    EXPORT_COMPRESSION: str = "none"  # none, gzip, zstd
+    EXPORT_DEBUG_VARIANT: bool = False
+    EXPORT_CHUNK_ROWS: int = 5000
+    EXPORT_GZIP_LEVEL: int = 6
+    EXPORT_ZSTD_LEVEL: int = 3
+
+    # Incremental re-enrichment (per-dataset snapshots of previous results)
+    INCREMENTAL_DIR: Path = Path(os.environ.get('RESULTS_DIR', './data/results')) / "incremental"
+    INCREMENTAL_RECHECK_BELOW: int = 70
+
+    # Cost accounting (USD) and budget degrade mode
+    SERPER_COST_PER_QUERY: float = 0.001
+    OPENAI_PROMPT_COST_PER_1K: float = 0.00015
+    OPENAI_COMPLETION_COST_PER_1K: float = 0.0006
+    OPENAI_FAST_PROMPT_COST_PER_1K: float = 0.00015
+    OPENAI_FAST_COMPLETION_COST_PER_1K: float = 0.0006
+    BUDGET_DEGRADED_LADDER_QUERIES: int = 2
+
+    # Synchronous lookup API
+    LOOKUP_TIMEOUT_SEC: float = 8.0
+    LOOKUP_MAX_TIMEOUT_SEC: float = 60.0
+    LOOKUP_MAX_BATCH: int = 100
+    LOOKUP_CACHE_SIZE: int = 10000
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,148 @@
+"""
+Crawler politeness and host caches shared by all crawl threads: per-host concurrency and delay, robots.txt rules,
+unreachable hosts, hosts that reject HEAD, canonical (post-redirect) base URLs and legal pages listed in sitemaps
+"""
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+from urllib.robotparser import RobotFileParser
+
+from backend.config import settings
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries expire after ttl seconds"""
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = max(1, int(maxsize))
+        self.data: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self.data[key]
+                return default
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        with self.lock:
+            self.data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class _HostState:
+    __slots__ = ("sem", "lock", "next_at")
+
+    def __init__(self, concurrency: int):
+        self.sem = threading.BoundedSemaphore(max(1, concurrency))
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+
+class CrawlPolicy:
+    def __init__(self):
+        self.hosts: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.robots = TTLCache(settings.CRAWL_ROBOTS_TTL_SEC, settings.CRAWL_HOST_CACHE_SIZE)
+        self.dead = TTLCache(settings.CRAWL_DEAD_HOST_TTL_SEC, settings.CRAWL_HOST_CACHE_SIZE)
+        self.no_head = TTLCache(settings.CRAWL_ROBOTS_TTL_SEC, settings.CRAWL_HOST_CACHE_SIZE)
+        self.canonical = TTLCache(settings.CRAWL_CANONICAL_TTL_SEC, settings.CRAWL_HOST_CACHE_SIZE)
+        self.sitemaps = TTLCache(settings.CRAWL_SITEMAP_TTL_SEC, settings.CRAWL_HOST_CACHE_SIZE)
+
+    # -------------------- Politeness --------------------
+    def _host(self, host: str) -> _HostState:
+        with self.lock:
+            st = self.hosts.get(host)
+            if st is None:
+                st = self.hosts[host] = _HostState(settings.CRAWL_HOST_CONCURRENCY)
+                while len(self.hosts) > settings.CRAWL_HOST_CACHE_SIZE:
+                    self.hosts.popitem(last=False)
+            else:
+                self.hosts.move_to_end(host)
+            return st
+
+    @contextmanager
+    def slot(self, host: str):
+        """At most CRAWL_HOST_CONCURRENCY requests in flight per host, started CRAWL_HOST_DELAY_SEC apart"""
+        st = self._host(host)
+        st.sem.acquire()
+        try:
+            with st.lock:
+                now = time.monotonic()
+                wait = st.next_at - now
+                st.next_at = max(now, st.next_at) + settings.CRAWL_HOST_DELAY_SEC
+            if wait > 0:
+                time.sleep(wait)
+            yield
+        finally:
+            st.sem.release()
+
+    @staticmethod
+    def user_agent(host: str, agents) -> str:
+        """CRAWL_USER_AGENT, else one browser agent per host (stable across requests, unlike a random pick)"""
+        if settings.CRAWL_USER_AGENT:
+            return settings.CRAWL_USER_AGENT
+        return agents[zlib.crc32(host.encode()) % len(agents)]
+
+    # -------------------- Host caches --------------------
+    def is_dead(self, host: str) -> bool:
+        return self.dead.get(host) is not None
+
+    def mark_dead(self, host: str, reason: str):
+        self.dead.set(host, reason)
+
+    def head_rejected(self, host: str) -> bool:
+        return self.no_head.get(host) is not None
+
+    def mark_head_rejected(self, host: str, status: int):
+        self.no_head.set(host, status)
+
+    def robots_for(self, host: str) -> Optional[RobotFileParser]:
+        """Cached parser for host, None when robots.txt was never fetched (or expired)"""
+        return self.robots.get(host)
+
+    def store_robots(self, host: str, status: int, text: str) -> RobotFileParser:
+        rp = RobotFileParser()
+        if status in (401, 403):
+            rp.disallow_all = True
+        elif 200 <= status < 300:
+            rp.parse(text.splitlines())
+        else:
+            rp.allow_all = True
+        self.robots.set(host, rp)
+        return rp
+
+    def canonical_base(self, domain: str) -> Optional[str]:
+        return self.canonical.get(domain)
+
+    def store_canonical(self, domain: str, base: str):
+        self.canonical.set(domain, base)
+
+    def sitemap_urls(self, host: str) -> Optional[list]:
+        """Legal page URLs found in the host's sitemaps, None when they were never read (or expired)"""
+        return self.sitemaps.get(host)
+
+    def store_sitemap_urls(self, host: str, urls: list):
+        self.sitemaps.set(host, urls)
+
+    def snapshot(self) -> dict:
+        return {"hosts": len(self.hosts), "robots": len(self.robots), "dead_hosts": len(self.dead),
+                "no_head": len(self.no_head), "canonical": len(self.canonical), "sitemaps": len(self.sitemaps)}
+
+
+crawl_policy = CrawlPolicy()
@@ -0,0 +1,227 @@
+"""
+Download helpers: ETag/Range handling and Accept-Encoding negotiation with cached compressed variants
+"""
+import asyncio
+import gzip
+import os
+import re
+import shutil
+import uuid
+import zlib
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+# -------------------- Constants --------------------
+READ_CHUNK = 256 * 1024
+
+# Already-compressed containers are never re-encoded
+INCOMPRESSIBLE_SUFFIXES = {".gz", ".zst", ".xlsx", ".xls", ".parquet", ".zip"}
+
+ENCODING_SUFFIX = {"br": ".br", "gzip": ".gz"}
+
+_RANGE_RE = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$", re.IGNORECASE)
+
+
+# -------------------- Helpers --------------------
+def file_etag(path: Path, encoding: str = "") -> str:
+    st = path.stat()
+    tag = f"{st.st_size:x}-{st.st_mtime_ns:x}"
+    if encoding:
+        tag += f"-{encoding}"
+    return f'"{tag}"'
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single 'bytes=start-end' range. Returns None if absent/unsupported, raises ValueError if unsatisfiable"""
+    if not header:
+        return None
+    m = _RANGE_RE.match(header)
+    if not m:
+        # Multi-range or other units: serve the full body
+        return None
+    first, last = m.group(1), m.group(2)
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("unsatisfiable range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+def _accepted_encodings(accept_encoding: Optional[str]) -> dict:
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        bits = part.strip().split(";")
+        name = bits[0].strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for b in bits[1:]:
+            b = b.strip()
+            if b.startswith("q="):
+                try:
+                    q = float(b[2:])
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> str:
+    """Pick br or gzip from Accept-Encoding (honouring q=0), '' for identity"""
+    accepted = _accepted_encodings(accept_encoding)
+    for enc in ("br", "gzip"):
+        if enc == "br" and brotli is None:
+            continue
+        if accepted.get(enc, accepted.get("*", 0.0)) > 0:
+            return enc
+    return ""
+
+
+def is_compressible(path: Path) -> bool:
+    return path.suffix.lower() not in INCOMPRESSIBLE_SUFFIXES
+
+
+def _compress_file(src: Path, dst: Path, encoding: str):
+    tmp = dst.with_name(dst.name + f".{uuid.uuid4().hex}.tmp")
+    with open(src, "rb") as fin, open(tmp, "wb") as fout:
+        if encoding == "gzip":
+            with gzip.GzipFile(fileobj=fout, mode="wb", compresslevel=6, mtime=0) as gz:
+                shutil.copyfileobj(fin, gz, READ_CHUNK)
+        else:
+            comp = brotli.Compressor(quality=5)
+            while True:
+                chunk = fin.read(READ_CHUNK)
+                if not chunk:
+                    break
+                fout.write(comp.process(chunk))
+            fout.write(comp.finish())
+    os.replace(tmp, dst)
+
+
+def variant_path(path: Path, encoding: str) -> Path:
+    return path.with_name(path.name + ENCODING_SUFFIX[encoding])
+
+
+async def ensure_compressed_variant(path: Path, encoding: str) -> Path:
+    """Return the cached compressed variant of path, (re)building it if missing or stale"""
+    dst = variant_path(path, encoding)
+    if dst.exists() and dst.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+        return dst
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _compress_file, path, dst, encoding)
+    return dst
+
+
+def remove_compressed_variants(path: Path):
+    for enc in ENCODING_SUFFIX:
+        v = variant_path(path, enc)
+        if v.exists():
+            os.remove(v)
+
+
+def iter_file_range(path: Path, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(READ_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def iter_gzip_stream(path: Path, size: int) -> Iterator[bytes]:
+    """On-the-fly gzip of the first `size` bytes of a (possibly growing) file"""
+    comp = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in iter_file_range(path, 0, size - 1):
+        out = comp.compress(chunk)
+        if out:
+            yield out
+    yield comp.flush()
+
+
+def _disposition(filename: str) -> str:
+    return f'attachment; filename="{filename}"'
+
+
+# -------------------- Responses --------------------
+async def build_download_response(request: Request, path: Path, filename: str,
+                                  media_type: str = "application/octet-stream") -> Response:
+    """Serve a finished file with ETag/304, single byte ranges and cached br/gzip variants"""
+    encoding = negotiate_encoding(request.headers.get("accept-encoding")) if is_compressible(path) else ""
+    body_path = await ensure_compressed_variant(path, encoding) if encoding else path
+    etag = file_etag(path, encoding)
+    base_headers = {"ETag": etag, "Accept-Ranges": "bytes", "Vary": "Accept-Encoding"}
+    if encoding:
+        base_headers["Content-Encoding"] = encoding
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=base_headers)
+
+    size = body_path.stat().st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and if_range and if_range.strip() != etag:
+        range_header = None
+    try:
+        rng = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**base_headers, "Content-Range": f"bytes */{size}"})
+
+    if rng is None:
+        headers = dict(base_headers)
+        headers["Content-Disposition"] = _disposition(filename)
+        return FileResponse(path=body_path, media_type=media_type, headers=headers)
+
+    start, end = rng
+    headers = dict(base_headers)
+    headers.update({
+        "Content-Range": f"bytes {start}-{end}/{size}",
+        "Content-Length": str(end - start + 1),
+        "Content-Disposition": _disposition(filename),
+    })
+    return StreamingResponse(iter_file_range(body_path, start, end), status_code=206,
+                             media_type=media_type, headers=headers)
+
+
+def build_partial_response(request: Request, path: Path, filename: str, media_type: str = "text/csv") -> Response:
+    """Serve the checkpoint file of a running job as it is right now (append-only, so ranges stay valid)"""
+    size = path.stat().st_size
+    headers = {"Accept-Ranges": "bytes", "Vary": "Accept-Encoding", "Cache-Control": "no-store",
+               "Content-Disposition": _disposition(filename)}
+    try:
+        rng = parse_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if rng is not None:
+        start, end = rng
+        headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+        return StreamingResponse(iter_file_range(path, start, end), status_code=206,
+                                 media_type=media_type, headers=headers)
+
+    accepted = _accepted_encodings(request.headers.get("accept-encoding"))
+    if size and accepted.get("gzip", accepted.get("*", 0.0)) > 0:
+        headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(iter_gzip_stream(path, size), media_type=media_type, headers=headers)
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(iter_file_range(path, 0, size - 1), media_type=media_type, headers=headers)
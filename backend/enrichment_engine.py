@@ -3,14 +3,19 @@ Core enrichment engine adapted from the Colab script
 """
 import io
 import json
+import logging
 import re
 import time
 import socket
 import random
 import asyncio
 import unicodedata
-from typing import Dict, List, Tuple, Set, Optional, Any
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
 from urllib.parse import urlparse, urljoin
 
 import pandas as pd
@@ -22,11 +27,25 @@ import chardet
 from bs4 import BeautifulSoup
 
 from backend.config import settings
+from backend.blocklist import default_blocklist
+from backend.clients import client_manager
+from backend.crawl_policy import crawl_policy
+from backend.hedging import hedger
+from backend.knowledge_index import knowledge_index
+from backend.metrics import (JobMetrics, span, observe, count, bind_job, unbind_job, CACHE_LOOKUPS, HTTP_RESPONSES,
+                             HTTP_RETRIES, OPENAI_TOKENS, ROWS_PROCESSED, PRERESOLVED, HEURISTIC_DECISIONS, HEURISTIC_AUDIT,
+                             DEADLINES, LLM_PARSE, MODEL_CASCADE, CRAWL_REQUESTS)
+from backend.usage import JobUsage
+
+logger = logging.getLogger(__name__)
 
 
 # -------------------- Constants --------------------
 TITLE_LIMIT = 90
 SNIPPET_LIMIT = 180
+PROMPT_URL_LIMIT = 120
+PROMPT_CONTEXT_LIMIT = 200
+CHARS_PER_TOKEN = 4  # rough estimate used for the prompt budget
 
 JITTER_RANGE = (0.05, 0.35)
 
@@ -43,12 +62,6 @@ CTX_SOCIALS = {"website", "site web", "url", "domain", "homepage", "linkedin", "
 CTX_REG = {"siren", "siret", "vat", "vat id", "kvk", "kvk number"}
 CONTEXT_KEYWORDS = list(CTX_LOCATION | CTX_DESCRIPTION | CTX_SECTOR | CTX_SOCIALS | CTX_REG)
 
-BLOCK_HOST_PARTS = {
-    "linkedin.com", "facebook.com", "instagram.com", "twitter.com", "x.com", "youtube.com", "tiktok.com",
-    "wikipedia.org", "wikidata.org", "crunchbase.com", "rocketreach.co", "apollo.io", "zoominfo.com",
-    "glassdoor", "indeed", "ycombinator.com", "angel.co", "medium.com", "blogspot", "news."
-}
-
 GENERIC_TOKENS = {
     "group", "holding", "holdings", "company", "co", "inc", "llc", "ltd", "plc", "sa", "sas", "sasu", "spa", "gmbh",
     "bv", "nv", "oy", "ab", "ag", "kg", "srl", "sl", "ltda", "pte", "pty", "limited", "corp", "corporation",
@@ -115,6 +128,8 @@ COMMON_LEGAL_PATHS = [
     "/mentions-legales", "/mentions_legales", "/informations-legales", "/legal", "/legal-notice",
     "/legal-notices", "/impressum", "/imprint", "/cgu", "/cgv", "/terms", "/conditions"
 ]
+LEGAL_URL_PATTERNS = ["legal", "impressum", "imprint", "mentions", "conditions", "terms", "cgu", "cgv"]
+SITEMAP_LOC_RE = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.IGNORECASE)
 
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
@@ -135,12 +150,22 @@ SPACE = r"[ \u00A0\u202F]*"
 DIG = r"\d"
 SIREN_CORE = rf"{DIG}{{3}}{SPACE}{DIG}{{3}}{SPACE}{DIG}{{3}}"
 SIRET_CORE = rf"{DIG}{{3}}{SPACE}{DIG}{{3}}{SPACE}{DIG}{{3}}{SPACE}{DIG}{{5}}"
-SIREN_RE = re.compile(rf"(?i)\b(?:siren|n°\s*siren|numero\s*siren|num\s*siren)\b[^0-9]{{0,20}}({SIREN_CORE})\b")
-SIRET_RE = re.compile(rf"(?i)\b(?:siret|n°\s*siret|numero\s*siret|num\s*siret)\b[^0-9]{{0,20}}({SIRET_CORE})\b")
-SIREN_FB = re.compile(rf"\b({SIREN_CORE})\b", re.IGNORECASE)
-SIRET_FB = re.compile(rf"\b({SIRET_CORE})\b", re.IGNORECASE)
-VAT_RE = re.compile(r"(?i)\b(?:VAT|TVA|USt-IdNr|Partita IVA|BTW|GST)\b[^A-Z0-9]{0,12}([A-Z0-9\-]{8,16})\b")
-KVK_RE = re.compile(r"(?i)\b(?:KvK|Kamer van Koophandel)\b[^0-9]{0,12}(\d{6,12})\b")
+# One pass over the page for every ID type. Labelled IDs are captured in lookaheads, so a label only consumes its own
+# word and the value stays visible to the other branches (a SIRET right after "VAT" is still a SIRET). Unlabelled
+# SIREN/SIRET are looked for inside each block of digits and spaces, with the 9- and 14-digit patterns below, so
+# overlapping readings of one block are all kept. The leading lookahead skips positions that cannot start a branch.
+_REG_LABEL_PREFIX = r"(?:n°\s*|numero\s*|num\s*)?"
+REG_ID_SCAN_RE = re.compile(
+    r"(?i)(?=[0-9VTUPBGKSN])(?:"
+    r"\b(?P<vat_label>VAT|TVA|USt-IdNr|Partita IVA|BTW|GST)\b(?=[^A-Z0-9]{0,12}(?P<vat>[A-Z0-9\-]{8,16})\b)"
+    r"|\b(?P<kvk_label>KvK|Kamer van Koophandel)\b(?=[^0-9]{0,12}(?P<kvk>\d{6,12})\b)"
+    rf"|\b(?P<siren_label>{_REG_LABEL_PREFIX}siren)\b(?=[^0-9]{{0,20}}(?P<siren>{SIREN_CORE})\b)"
+    rf"|\b(?P<siret_label>{_REG_LABEL_PREFIX}siret)\b(?=[^0-9]{{0,20}}(?P<siret>{SIRET_CORE})\b)"
+    r"|(?<!\d)(?P<num>\d[\d ]{7,}\d)"
+    r")"
+)
+SIREN_BLOCK_RE = re.compile(rf"\b({SIREN_CORE})\b")
+SIRET_BLOCK_RE = re.compile(rf"\b({SIRET_CORE})\b")
 
 
 # -------------------- Helper Functions --------------------
@@ -157,13 +182,31 @@ def strip_to_domain(u: str) -> str:
         return ""
 
 
+@lru_cache(maxsize=4096)
+def _is_mark(ch: str) -> bool:
+    return unicodedata.category(ch) == "Mn"
+
+
 def _ascii_lower(s: str) -> str:
-    s = unicodedata.normalize("NFD", str(s))
-    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    s = str(s)
+    if s.isascii():
+        return s.lower()
+    s = unicodedata.normalize("NFD", s)
+    if len(s) < 512:
+        return "".join(ch for ch in s if ch.isascii() or not _is_mark(ch)).lower()
+    # Long text (a joined column): one regex pass deleting only the marks that occur in it
+    marks = [ch for ch in set(s) if not ch.isascii() and _is_mark(ch)]
+    if marks:
+        s = re.sub("[" + "".join(re.escape(ch) for ch in marks) + "]", "", s)
     return s.lower()
 
 
 def domain_tokens(domain: str) -> List[str]:
+    return list(_domain_tokens(domain))
+
+
+@lru_cache(maxsize=65536)
+def _domain_tokens(domain: str) -> Tuple[str, ...]:
     host = strip_to_domain(domain)
     ext = tldextract.extract(host)
     sld = ext.domain.lower()
@@ -185,13 +228,44 @@ def domain_tokens(domain: str) -> List[str]:
         else:
             expanded.append(t)
     toks = [x for x in expanded if x]
-    return [t for t in toks if t not in GENERIC_TOKENS]
+    return tuple(t for t in toks if t not in GENERIC_TOKENS)
+
+
+_NON_ALNUM_NL = re.compile(r"[^a-z0-9\n]+")
+
+# name -> tokens; primed column-wise by prime_name_tokens, filled lazily by name_tokens
+_NAME_TOKENS_CACHE: Dict[str, Tuple[str, ...]] = {}
+NAME_TOKENS_CACHE_MAX = 500000
+
+
+def _cache_name_tokens(name: str, toks: Tuple[str, ...]):
+    if len(_NAME_TOKENS_CACHE) >= NAME_TOKENS_CACHE_MAX:
+        _NAME_TOKENS_CACHE.clear()
+    _NAME_TOKENS_CACHE[name] = toks
 
 
 def name_tokens(name: str) -> List[str]:
-    n = re.sub(r"[^a-z0-9]+", " ", _ascii_lower(name)).strip()
-    toks = [t for t in n.split() if t]
-    return [t for t in toks if t not in GENERIC_TOKENS]
+    key = str(name)
+    toks = _NAME_TOKENS_CACHE.get(key)
+    if toks is None:
+        n = re.sub(r"[^a-z0-9]+", " ", _ascii_lower(key)).strip()
+        toks = tuple(t for t in n.split() if t and t not in GENERIC_TOKENS)
+        _cache_name_tokens(key, toks)
+    return list(toks)
+
+
+def prime_name_tokens(values) -> List[Tuple[str, ...]]:
+    """Tokenize many names in one normalization pass over the joined column (same result as name_tokens)"""
+    names = [str(v) for v in values]
+    if not names:
+        return []
+    blob = _ascii_lower("\n".join(n.replace("\n", " ") for n in names))
+    out = []
+    for name, line in zip(names, _NON_ALNUM_NL.sub(" ", blob).split("\n")):
+        toks = tuple(t for t in line.split() if t not in GENERIC_TOKENS)
+        _cache_name_tokens(name, toks)
+        out.append(toks)
+    return out
 
 
 def token_string_for_distance_company(company: str) -> str:
@@ -355,7 +429,29 @@ def extract_first_json(txt: str):
     return m.group(0) if m else t
 
 
+# Private suffixes (github.io, myshopify.com, wixsite.com...) count as public ones, so that distinct sites on a shared
+# host stay distinct candidates
+_PRIVATE_SUFFIX_EXTRACT = tldextract.TLDExtract(include_psl_private_domains=True)
+
+
+@lru_cache(maxsize=65536)
+def _split_host(host: str) -> Tuple[str, str, str]:
+    ext = _PRIVATE_SUFFIX_EXTRACT(host)
+    return ext.subdomain.lower(), ext.domain.lower(), ext.suffix.lower()
+
+
+def registrable_domain(host: str) -> str:
+    """eTLD+1 of a host (fr.acme.co.uk -> acme.co.uk); the host itself when there is no public suffix"""
+    _, dom, suffix = _split_host(host)
+    return f"{dom}.{suffix}" if dom and suffix else host
+
+
+def is_blocked_host(host: str) -> bool:
+    return default_blocklist().is_blocked(host)
+
+
 def filter_candidates(results):
+    """Drop blocked hosts and keep only the best-ranked result per registrable domain"""
     seen = set()
     out = []
     for it in results:
@@ -365,12 +461,13 @@ def filter_candidates(results):
         host = strip_to_domain(link)
         if not host:
             continue
-        if any(bad in host for bad in BLOCK_HOST_PARTS):
+        if is_blocked_host(host):
             continue
-        if host in seen:
+        site = registrable_domain(host)
+        if site in seen:
             continue
-        seen.add(host)
-        out.append({"url": link, "domain": host, "title": title, "snippet": snippet})
+        seen.add(site)
+        out.append({"url": link, "domain": host, "site": site, "title": title, "snippet": snippet})
     return out
 
 
@@ -386,10 +483,121 @@ def dns_ok(domain: str, timeout=None) -> bool:
         return False
 
 
+async def dns_resolves(domain: str, timeout=None) -> bool:
+    """Non-blocking DNS check (always performed, unlike dns_ok which follows ENABLE_DNS_CHECK)"""
+    loop = asyncio.get_running_loop()
+    try:
+        await asyncio.wait_for(loop.getaddrinfo(strip_to_domain(domain), 443),
+                               timeout=timeout or settings.DNS_TIMEOUT_SEC)
+        return True
+    except Exception:
+        return False
+
+
+# -------------------- Deterministic Pre-resolution --------------------
+_DOMAIN_RE = re.compile(r"^(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,24}$")
+_SOCIAL_KEY_PARTS = ("website", "site", "url", "domain", "homepage")
+
+
+def looks_like_domain(value: str) -> str:
+    """Return the bare host if value is a URL/hostname, else ''"""
+    v = str(value or "").strip().lower()
+    if not v or " " in v or "@" in v:
+        return ""
+    host = strip_to_domain(v if "://" in v else "http://" + v)
+    host = host.split(":", 1)[0].strip(".")
+    return host if _DOMAIN_RE.match(host) else ""
+
+
+def context_domains(ctx: dict) -> List[str]:
+    """Candidate official domains carried by website/domain/url context columns (social profiles ignored)"""
+    out = []
+    for k, v in (ctx or {}).items():
+        kl = str(k).lower().strip()
+        if kl not in CTX_SOCIALS and not any(p in kl for p in _SOCIAL_KEY_PARTS):
+            continue
+        for token in re.split(r"[\s,;|]+", safe_json(v)):
+            host = looks_like_domain(token)
+            if host and not is_blocked_host(host) and host not in out:
+                out.append(host)
+    return out
+
+
+def name_domain(company: str) -> str:
+    """The company name itself when it is a hostname, e.g. 'acme.io'"""
+    host = looks_like_domain(company)
+    return host if host and not is_blocked_host(host) else ""
+
+
+# -------------------- Heuristic Pre-ranking --------------------
+def heuristic_score(company: str, ctx: dict, cand: dict) -> int:
+    """Local 1-100 score of one candidate from name/domain similarity and context"""
+    dom = cand.get("domain", "")
+    sim = levenshtein_ratio(token_string_for_distance_company(company), token_string_for_distance_domain(dom))
+    overlap = strong_token_overlap(company, dom)
+    if alias_match(company, dom) or sim >= 0.95:
+        base = 95
+    elif overlap and sim >= 0.80:
+        base = 88
+    elif sim >= 0.80:
+        base = 80
+    elif overlap:
+        base = 70
+    else:
+        base = 40
+    return max(1, min(100, base - context_match_effect(company, ctx, cand) + context_positive_bonus(ctx, cand)))
+
+
+def heuristic_choice(company: str, ctx: dict, candidates: list) -> Optional[dict]:
+    """Best candidate when it clears HEURISTIC_ACCEPT_SCORE and no other candidate looks like the company"""
+    considered = candidates[:settings.MAX_CANDIDATES_PER_COMPANY]
+    if not considered:
+        return None
+    scored = [(heuristic_score(company, ctx, c), i) for i, c in enumerate(considered)]
+    score, i = max(scored, key=lambda t: (t[0], -t[1]))
+    best = considered[i]
+    if score < settings.HEURISTIC_ACCEPT_SCORE:
+        return None
+    if ambiguity_count(company, considered, chosen_domain=best["domain"]) > 0:
+        return None
+    if not homonym_guard(company, best["domain"], "entity"):
+        return None
+    return {"domain": best["domain"], "url": best.get("url", ""), "score": score}
+
+
+# -------------------- Model Cascade --------------------
+def cascade_enabled() -> bool:
+    return bool(settings.OPENAI_FAST_MODEL) and settings.OPENAI_FAST_MODEL != settings.OPENAI_MODEL
+
+
+def tier_model(tier: str) -> str:
+    return settings.OPENAI_FAST_MODEL if tier == "fast" else settings.OPENAI_MODEL
+
+
+def escalation_reason(company: str, candidates: list, g: dict) -> str:
+    """Why a fast-tier answer goes to the main model ('' keeps it)"""
+    if (g.get("reason") or "").endswith("-deadline"):
+        return ""
+    conf = (g.get("confidence") or "null").strip().lower()
+    d = ""
+    for key in ("chosen_domain", "found_domain"):
+        raw = (g.get(key) or "").strip().lower()
+        if raw not in ("", "null", "none"):
+            d = strip_to_domain(raw)
+            break
+    if conf == "null" or not d:
+        return "null_confidence"
+    if not homonym_guard(company, d, conf):
+        return "homonym_guard"
+    if ambiguity_count(company, candidates, chosen_domain=d) >= settings.CASCADE_ESCALATE_AMBIGUITY:
+        return "ambiguity"
+    return ""
+
+
 # -------------------- Legal Pages & Registration --------------------
-def _random_headers():
+def _crawl_headers(host: str) -> dict:
     h = dict(HEADERS_BASE)
-    h["User-Agent"] = random.choice(USER_AGENTS)
+    h["User-Agent"] = crawl_policy.user_agent(host, USER_AGENTS)
     return h
 
 
@@ -398,14 +606,112 @@ def _decode_response(resp: requests.Response) -> str:
     return resp.content.decode(enc, errors="replace")
 
 
-def fetch_get(url: str, timeout: int = 10) -> tuple:
+def robots_allowed(url: str, host: str, timeout: int = 10) -> bool:
+    """robots.txt check; each host's rules are fetched once and cached (CRAWL_ROBOTS_TTL_SEC)"""
+    if not settings.CRAWL_RESPECT_ROBOTS:
+        return True
+    rp = crawl_policy.robots_for(host)
+    if rp is None:
+        p = urlparse(url)
+        status, text = 0, ""
+        try:
+            with crawl_policy.slot(host):
+                r = client_manager.crawler().get(f"{p.scheme}://{p.netloc}/robots.txt", headers=_crawl_headers(host),
+                                                 timeout=timeout)
+            status, text = r.status_code, r.text
+        except requests.exceptions.SSLError:
+            # A TLS problem is not an unreachable host: no robots rules, the page fetch reports its own error
+            count(CRAWL_REQUESTS, outcome="tls_error")
+        except (requests.ConnectionError, requests.Timeout):
+            crawl_policy.mark_dead(host, "unreachable")
+            count(CRAWL_REQUESTS, outcome="dead_marked")
+            return False
+        except Exception:
+            pass
+        rp = crawl_policy.store_robots(host, status, text)
+    # Matched against the User-Agent the crawler actually sends to this host
+    return rp.can_fetch(crawl_policy.user_agent(host, USER_AGENTS), url)
+
+
+def crawl_request(method: str, url: str, timeout: int = 10, **kwargs) -> Optional[requests.Response]:
+    """Request through the crawl policy; None for unreachable hosts, robots-disallowed URLs and errors"""
+    host = (urlparse(url).hostname or "").lower()
+    if crawl_policy.is_dead(host):
+        count(CRAWL_REQUESTS, outcome="skipped_dead")
+        return None
+    if not robots_allowed(url, host, timeout):
+        if not crawl_policy.is_dead(host):
+            count(CRAWL_REQUESTS, outcome="robots_disallowed")
+        return None
     try:
-        r = requests.get(url, headers=_random_headers(), timeout=timeout, allow_redirects=True)
-        if "text/html" in (r.headers.get("Content-Type", "").lower()):
-            return r.status_code, _decode_response(r)
+        with crawl_policy.slot(host):
+            r = client_manager.crawler().request(method, url, headers=_crawl_headers(host), timeout=timeout,
+                                                 allow_redirects=True, **kwargs)
+        count(CRAWL_REQUESTS, outcome="fetched" if method == "GET" else method.lower())
+        return r
+    except requests.exceptions.SSLError:
+        count(CRAWL_REQUESTS, outcome="tls_error")
+    except (requests.ConnectionError, requests.Timeout):
+        # Refused, unresolvable or too slow: skip the host for CRAWL_DEAD_HOST_TTL_SEC
+        crawl_policy.mark_dead(host, "unreachable")
+        count(CRAWL_REQUESTS, outcome="dead_marked")
     except Exception:
         pass
-    return 0, ""
+    return None
+
+
+def fetch_page(url: str, timeout: int = 10) -> tuple:
+    """(status, html, final_url); status 0 for unreachable hosts, robots-disallowed URLs and errors"""
+    r = crawl_request("GET", url, timeout)
+    if r is None:
+        return 0, "", url
+    try:
+        if "text/html" in (r.headers.get("Content-Type", "").lower()):
+            return r.status_code, _decode_response(r), r.url
+        return r.status_code, "", r.url
+    except Exception:
+        return 0, "", url
+
+
+def fetch_get(url: str, timeout: int = 10) -> tuple:
+    status, html, _ = fetch_page(url, timeout=timeout)
+    return status, html
+
+
+def fetch_text(url: str, timeout: int = 10, max_bytes: int = 2_000_000) -> str:
+    """Body of a 200 response of any content type, read and gunzipped up to max_bytes each ("" otherwise)"""
+    r = crawl_request("GET", url, timeout, stream=True)
+    if r is None:
+        return ""
+    try:
+        if r.status_code != 200:
+            return ""
+        body = bytearray()
+        for chunk in r.iter_content(65536):
+            body += chunk
+            if len(body) >= max_bytes:
+                break
+        data = bytes(body)
+        if data[:2] == b"\x1f\x8b":
+            # gunzip at most max_bytes too, so a small gzip bomb cannot blow up memory
+            data = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(data, max_length=max_bytes)
+        return data.decode(r.encoding or "utf-8", errors="replace")
+    except Exception:
+        return ""
+    finally:
+        r.close()
+
+
+def probe_page(url: str, timeout: int = 10) -> tuple:
+    """(status, final_url, content_type) of a HEAD request, redirects followed; status 0 on errors"""
+    r = crawl_request("HEAD", url, timeout)
+    if r is None:
+        return 0, url, ""
+    return r.status_code, r.url, r.headers.get("Content-Type", "").lower()
+
+
+def is_legal_url(url: str) -> bool:
+    return any(p in urlparse(url).path.lower() for p in LEGAL_URL_PATTERNS)
 
 
 def find_legal_links_in_html(html_text: str, base_url: str) -> List[str]:
@@ -415,19 +721,10 @@ def find_legal_links_in_html(html_text: str, base_url: str) -> List[str]:
         for a in soup.find_all("a", href=True):
             text = (a.get_text() or "").strip().lower()
             href = (a["href"] or "").strip()
-            if any(p in text for p in LEGAL_TEXT_PATTERNS) or any(
-                    p in href.lower() for p in ["legal", "impressum", "mentions", "conditions", "terms"]):
+            if any(p in text for p in LEGAL_TEXT_PATTERNS) or any(p in href.lower() for p in LEGAL_URL_PATTERNS):
                 out.append(urljoin(base_url, href))
     except Exception:
         pass
-    try:
-        parsed = urlparse(base_url)
-        base = f"{parsed.scheme}://{parsed.netloc}"
-        for p in COMMON_LEGAL_PATHS:
-            out.append(base + p)
-            out.append(base + p + "/")
-    except Exception:
-        pass
     uniq, seen = [], set()
     for u in out:
         if u not in seen:
@@ -457,58 +754,207 @@ def luhn_check(number_str: str) -> bool:
     return (checksum % 10) == 0
 
 
-def extract_reg_ids(text: str) -> dict:
-    out = {"siren": set(), "siret": set(), "vat": set(), "kvk": set()}
+def _vat_mod97(body: str) -> bool:
+    """BE: 10 digits, the last two are 97 - (first eight mod 97)"""
+    return len(body) == 10 and body.isdigit() and 97 - int(body[:8]) % 97 == int(body[8:])
+
+
+def _vat_mod11_10(body: str) -> bool:
+    """DE: 9 digits, ISO 7064 MOD 11,10 check digit"""
+    if len(body) != 9 or not body.isdigit():
+        return False
+    product = 10
+    for d in body[:8]:
+        s = (int(d) + product) % 10 or 10
+        product = (2 * s) % 11
+    return (11 - product) % 10 == int(body[8])
+
+
+def vat_check(vat: str) -> bool:
+    """Check digits of FR, BE, DE and IT VAT numbers; other numbers only need a digit (not a word after the label)"""
+    v = vat.replace("-", "")
+    if not any(ch.isdigit() for ch in v):
+        return False
+    cc, body = v[:2], v[2:]
+    if cc == "FR":
+        # Key + SIREN; the numeric key is (12 + 3 * (SIREN mod 97)) mod 97, alphanumeric keys are not checked
+        if len(body) != 11 or not body[2:].isdigit():
+            return False
+        return not body[:2].isdigit() or int(body[:2]) == (12 + 3 * (int(body[2:]) % 97)) % 97
+    if cc == "BE":
+        return _vat_mod97(body if len(body) == 10 else "0" + body)
+    if cc == "DE":
+        return _vat_mod11_10(body)
+    if cc == "IT":
+        return len(body) == 11 and body.isdigit() and luhn_check(body)
+    return True
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _add_reg_id(found: dict, kind: str, value: str, label: Optional[str]):
+    """Keep one entry per ID, with the first label seen for it (an unlabelled sighting never hides a label)"""
+    if found.get((kind, value)) is None:
+        found[(kind, value)] = label
+
+
+def _scan_digit_block(tnorm: str, start: int, end: int, found: dict):
+    """SIRET and SIREN readings of the digit block tnorm[start:end]"""
+    block = tnorm[start:end]
+    if sum(ch.isdigit() for ch in block) < 9:
+        return
+    # A letter glued to the block leaves no word boundary there, as in the full text
+    if start > 0 and _is_word_char(tnorm[start - 1]):
+        block = "x" + block
+    if end < len(tnorm) and _is_word_char(tnorm[end]):
+        block += "x"
+    for raw in SIRET_BLOCK_RE.findall(block):
+        d = _digits_only(raw)
+        if luhn_check(d[:9]):
+            _add_reg_id(found, "siret", d, None)
+    for raw in SIREN_BLOCK_RE.findall(block):
+        d = _digits_only(raw)
+        if luhn_check(d):
+            _add_reg_id(found, "siren", d, None)
+
+
+def scan_reg_ids(text: str) -> list:
+    """(kind, value, label) for every checksum-valid registration ID, in one regex pass over the page. label is the
+    text of the label the value followed ("N° SIRET", "TVA", "KvK"...), or None for a number found without one"""
+    found = {}
     if not text:
-        return out
+        return []
     tnorm = text.replace("\u00A0", " ").replace("\u202F", " ")
-    for m in SIRET_RE.findall(tnorm) + SIRET_FB.findall(tnorm):
-        d = _digits_only(m)
-        if len(d) == 14 and luhn_check(d[:9]):
-            out["siret"].add(d)
-    for m in SIREN_RE.findall(tnorm) + SIREN_FB.findall(tnorm):
-        d = _digits_only(m)
-        if len(d) == 9 and luhn_check(d):
-            out["siren"].add(d)
+    for m in REG_ID_SCAN_RE.finditer(tnorm):
+        kind = m.lastgroup
+        if kind == "num":
+            _scan_digit_block(tnorm, m.start(), m.end(), found)
+        elif kind == "vat":
+            vat = m.group("vat").strip().upper()
+            if vat_check(vat):
+                _add_reg_id(found, "vat", vat, m.group("vat_label"))
+        elif kind == "kvk":
+            _add_reg_id(found, "kvk", _digits_only(m.group("kvk")), m.group("kvk_label"))
+        else:
+            d = _digits_only(m.group(kind))
+            if luhn_check(d[:9]):
+                _add_reg_id(found, kind, d, m.group(kind + "_label"))
+    return [(kind, value, label) for (kind, value), label in found.items()]
+
+
+def extract_reg_ids(text: str) -> dict:
+    out = {"siren": set(), "siret": set(), "vat": set(), "kvk": set()}
+    for kind, value, _ in scan_reg_ids(text):
+        out[kind].add(value)
     if out["siret"] and not out["siren"]:
-        for siret in out["siret"]:
-            s9 = siret[:9]
-            if luhn_check(s9):
-                out["siren"].add(s9)
-    for m in VAT_RE.findall(tnorm):
-        out["vat"].add(m.strip().upper())
-    for m in KVK_RE.findall(tnorm):
-        out["kvk"].add(_digits_only(m))
+        out["siren"].update(siret[:9] for siret in out["siret"])
     return out
 
 
+def sitemap_legal_urls(dom: str, base: str, host: str, timeout: int = 10) -> List[str]:
+    """Legal-looking pages of dom listed in the host's sitemaps (robots.txt Sitemap: lines, else /sitemap.xml)"""
+    cached = crawl_policy.sitemap_urls(host)
+    if cached is not None:
+        return cached
+    rp = crawl_policy.robots_for(host)
+    queue = list((rp.site_maps() if rp is not None else None) or [base + "/sitemap.xml"])
+    urls, files = [], 0
+    while queue and files < settings.CRAWL_SITEMAP_MAX_FILES:
+        xml = fetch_text(queue.pop(0), timeout, settings.CRAWL_SITEMAP_MAX_BYTES)
+        files += 1
+        children = []
+        for loc in SITEMAP_LOC_RE.findall(xml):
+            loc = loc.replace("&amp;", "&")
+            path = urlparse(loc).path.lower()
+            if path.endswith((".xml", ".xml.gz")):
+                children.append(loc)
+            elif is_legal_url(loc) and loc not in urls:
+                site = strip_to_domain(loc)
+                if site == dom or site.endswith("." + dom):
+                    urls.append(loc)
+        # Sitemap index: WordPress-style page sitemaps first, post and product sitemaps rarely list legal pages
+        queue += sorted(children, key=lambda u: "page" not in u.lower())
+    crawl_policy.store_sitemap_urls(host, urls)
+    return urls
+
+
+def guessed_legal_urls(base: str, timeout: int = 10):
+    """COMMON_LEGAL_PATHS under base worth a GET: the ones a HEAD request finds, or both slash variants of every path
+    when CRAWL_HEAD_PROBE is off or the server rejects HEAD (then the remaining paths are not probed either)"""
+    host = (urlparse(base).hostname or "").lower()
+    probe = settings.CRAWL_HEAD_PROBE and not crawl_policy.head_rejected(host)
+    for p in COMMON_LEGAL_PATHS:
+        if probe:
+            status, final_url, ctype = probe_page(base + p, timeout)
+            if 200 <= status < 300 and (not ctype or "text/html" in ctype):
+                yield final_url
+            if status not in (0, 403, 405, 501):
+                continue
+            # WAF/CDN front-ends often refuse HEAD but serve GET
+            probe = False
+            if status:
+                crawl_policy.mark_head_rejected(host, status)
+        yield base + p
+        yield base + p + "/"
+
+
+def _has_reg_ids(found: dict) -> bool:
+    return any(found.values())
+
+
 def crawl_registration_for_domain(domain: str, timeout_per_req=10, hard_cap_pages=12) -> dict:
-    res = {"domain": domain, "found": {"siren": set(), "siret": set(), "vat": set(), "kvk": set()}, "legal_urls": []}
-    base = f"https://{strip_to_domain(domain)}"
-    status, html_home = fetch_get(base, timeout=timeout_per_req)
-    cand_urls = []
+    res = {"domain": domain, "found": {"siren": set(), "siret": set(), "vat": set(), "kvk": set()}, "legal_urls": [],
+           "pages_fetched": 1}
+    dom = strip_to_domain(domain)
+    # Start from the base URL the domain redirected to last time
+    base = crawl_policy.canonical_base(dom) or settings.CRAWL_BASE_URL.format(domain=dom)
+    host = (urlparse(base).hostname or "").lower()
+    if crawl_policy.is_dead(host):
+        count(CRAWL_REQUESTS, outcome="skipped_dead")
+        res["pages_fetched"] = 0
+        return res
+    status, html_home, final_url = fetch_page(base, timeout=timeout_per_req)
+    linked = []
+    fetched = {base, base + "/", final_url}
     if html_home:
-        cand_urls += find_legal_links_in_html(html_home, base)
-    for p in COMMON_LEGAL_PATHS:
-        cand_urls.append(base + p)
-        cand_urls.append(base + p + "/")
-    seen, uniq = set(), []
-    for u in cand_urls:
-        if u not in seen:
-            seen.add(u)
-            uniq.append(u)
-        if len(uniq) >= hard_cap_pages:
-            break
-    res["legal_urls"] = uniq
-    if base not in uniq:
-        uniq.append(base)
-    for u in uniq:
-        st, html = fetch_get(u, timeout=timeout_per_req)
-        if not html:
-            continue
-        ids = extract_reg_ids(html)
-        for k in res["found"].keys():
-            res["found"][k].update(ids.get(k, set()))
+        p = urlparse(final_url)
+        if p.netloc and f"{p.scheme}://{p.netloc}" != base:
+            base = f"{p.scheme}://{p.netloc}"
+            host = (p.hostname or "").lower()
+            crawl_policy.store_canonical(dom, base)
+            fetched.update((base, base + "/"))
+        linked = find_legal_links_in_html(html_home, final_url)
+        for k, ids in extract_reg_ids(html_home).items():
+            res["found"][k].update(ids)
+
+    def crawl(urls, until_found: bool):
+        """GET urls up to hard_cap_pages; with until_found, stop as soon as a registration ID turned up"""
+        if len(res["legal_urls"]) >= hard_cap_pages:
+            return
+        for u in urls:
+            if u not in fetched:
+                fetched.add(u)
+                res["legal_urls"].append(u)
+                st, html = fetch_get(u, timeout=timeout_per_req)
+                res["pages_fetched"] += 1
+                if html:
+                    for k, ids in extract_reg_ids(html).items():
+                        res["found"][k].update(ids)
+            if (len(res["legal_urls"]) >= hard_cap_pages or crawl_policy.is_dead(host)
+                    or (until_found and _has_reg_ids(res["found"]))):
+                return
+
+    # Cheapest sources first: pages the home page links to, then the sitemaps, then HEAD-probed guesses.
+    # A host whose home page is missing is not worth searching further.
+    crawl(linked, until_found=False)
+    if _has_reg_ids(res["found"]) or crawl_policy.is_dead(host) or status in (404, 410):
+        return res
+    if settings.CRAWL_USE_SITEMAPS:
+        crawl(sitemap_legal_urls(dom, base, host, timeout_per_req), until_found=True)
+    if not _has_reg_ids(res["found"]) and not crawl_policy.is_dead(host):
+        crawl(guessed_legal_urls(base, timeout_per_req), until_found=True)
     return res
 
 
@@ -565,9 +1011,11 @@ def should_retry(status):
     return status in (429, 500, 502, 503, 504)
 
 
-async def post_json_with_retries(session: aiohttp.ClientSession, url, headers, body, tag="req"):
+async def post_json_with_retries(session: aiohttp.ClientSession, url, headers, body, tag="req", max_retries=None):
     last_payload = None
-    for attempt in range(1, settings.MAX_RETRIES + 1):
+    max_retries = max(1, max_retries if max_retries is not None else settings.MAX_RETRIES)
+    for attempt in range(1, max_retries + 1):
+        t0 = time.monotonic()
         try:
             async with async_timeout.timeout(settings.HTTP_CONNECT_TIMEOUT + settings.HTTP_READ_TIMEOUT):
                 async with session.post(
@@ -579,17 +1027,22 @@ async def post_json_with_retries(session: aiohttp.ClientSession, url, headers, b
                         )
                 ) as resp:
                     status = resp.status
+                    count(HTTP_RESPONSES, tag=tag, status=status)
                     try:
                         payload = await resp.json()
                     except Exception:
                         payload = await resp.text()
                     if isinstance(payload, dict):
                         last_payload = payload
+                    if status == 200:
+                        hedger.latency.observe(tag, time.monotonic() - t0)
                     if status == 200 or not should_retry(status):
                         return status, payload
         except (aiohttp.ClientConnectionError, asyncio.TimeoutError, aiohttp.ClientPayloadError):
-            pass
-        await asyncio.sleep((settings.BACKOFF_BASE ** (attempt - 1)) + rand_jitter())
+            count(HTTP_RESPONSES, tag=tag, status="error")
+        if attempt < max_retries:
+            count(HTTP_RETRIES, tag=tag)
+            await asyncio.sleep((settings.BACKOFF_BASE ** (attempt - 1)) + rand_jitter())
     return None, last_payload
 
 
@@ -614,6 +1067,88 @@ class RPSLimiter:
             self.window.append(time.monotonic())
 
 
+# Factory for another slot of the provider whose slot the current task holds (set by EnrichmentEngine.provider_slot)
+_provider_slot: ContextVar[Optional[Callable[[], Any]]] = ContextVar("provider_slot", default=None)
+
+
+def hedge_gate(limiter: RPSLimiter = None) -> Callable[[], Any]:
+    """What a hedged duplicate must take before it is sent: a provider slot of its own, then a limiter token"""
+    slot = _provider_slot.get()
+
+    @asynccontextmanager
+    async def gate():
+        if slot is None:
+            if limiter is not None:
+                await limiter.acquire()
+            yield
+            return
+        async with slot():
+            if limiter is not None:
+                await limiter.acquire()
+            yield
+    return gate
+
+
+# -------------------- Deadlines --------------------
+STAGE_DEADLINES = {"serp": "SERP_DEADLINE_SEC", "llm": "LLM_DEADLINE_SEC", "crawl": "CRAWL_DEADLINE_SEC"}
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage: str):
+        super().__init__(f"{stage} deadline exceeded")
+        self.stage = stage
+
+
+class RowClock:
+    """Time one row spent inside provider calls and crawls, per stage (slot waits and pauses are not counted)"""
+    __slots__ = ("spent", "total")
+
+    def __init__(self):
+        self.spent: Dict[str, float] = {}
+        self.total = 0.0
+
+    def remaining(self, stage: str) -> Optional[float]:
+        limits = []
+        if settings.ROW_DEADLINE_SEC > 0:
+            limits.append(settings.ROW_DEADLINE_SEC - self.total)
+        stage_limit = getattr(settings, STAGE_DEADLINES[stage])
+        if stage_limit > 0:
+            limits.append(stage_limit - self.spent.get(stage, 0.0))
+        return min(limits) if limits else None
+
+    def add(self, stage: str, seconds: float):
+        self.spent[stage] = self.spent.get(stage, 0.0) + seconds
+        self.total += seconds
+
+
+_row_clock: ContextVar[Optional[RowClock]] = ContextVar("row_clock", default=None)
+
+
+@asynccontextmanager
+async def stage_deadline(stage: str):
+    """Bound the enclosed work by what is left of the stage and row budgets; raise DeadlineExceeded past them"""
+    clock = _row_clock.get()
+    remaining = clock.remaining(stage) if clock is not None else None
+    if remaining is None:
+        yield
+        return
+    if remaining <= 0:
+        count(DEADLINES, stage=stage)
+        raise DeadlineExceeded(stage)
+    t0 = time.monotonic()
+    cm = async_timeout.timeout(remaining)
+    try:
+        async with cm:
+            yield
+    except asyncio.TimeoutError:
+        if not cm.expired:
+            raise
+        count(DEADLINES, stage=stage)
+        raise DeadlineExceeded(stage)
+    finally:
+        clock.add(stage, time.monotonic() - t0)
+
+
 # -------------------- OpenAI & SERP Calls --------------------
 def openai_headers():
     h = {"Authorization": f"Bearer {settings.OPENAI_API_KEY}", "Content-Type": "application/json"}
@@ -637,52 +1172,172 @@ async def openai_preflight(session: aiohttp.ClientSession) -> bool:
     return True
 
 
-def build_user_prompt(index: int, company: str, context: dict, candidates: list) -> str:
+def compact_url(url: str) -> str:
+    """URL without query string or fragment, capped at PROMPT_URL_LIMIT characters"""
+    try:
+        p = urlparse(url)
+        if p.netloc:
+            url = f"{p.scheme}://{p.netloc}{p.path}"
+    except Exception:
+        pass
+    return url[:PROMPT_URL_LIMIT]
+
+
+def build_user_prompt(index: int, company: str, context: dict, candidates: list, token_budget: int = None) -> str:
+    """Prompt trimmed to roughly token_budget tokens: snippets shrink first, then trailing candidates go"""
     lines = [f"index={index}", f'name="{company}"']
     if context:
         ctx_bits = []
         for k, v in context.items():
             vs = safe_json(v)
             if vs:
-                ctx_bits.append(f'{k}="{vs}"')
+                ctx_bits.append(f'{k}="{vs[:PROMPT_CONTEXT_LIMIT]}"')
         if ctx_bits:
             lines.append("context: " + " ; ".join(ctx_bits))
     lines.append("\nCandidates:")
-    for i, c in enumerate(candidates[:settings.MAX_CANDIDATES_PER_COMPANY]):
-        title = (c.get("title", "") or "")[:TITLE_LIMIT]
-        snip = (c.get("snippet", "") or "")[:SNIPPET_LIMIT]
-        lines.append(f'[{i}] url="{c.get("url", "")}" title="{title}" snippet="{snip}"')
-    return "\n".join(lines)
-
+    budget = (token_budget or settings.PROMPT_TOKEN_BUDGET) * CHARS_PER_TOKEN
+    head_len = sum(len(x) + 1 for x in lines)
+    considered = candidates[:settings.MAX_CANDIDATES_PER_COMPANY]
+    cand_lines = []
+    for snip_limit in (SNIPPET_LIMIT, SNIPPET_LIMIT // 2, 0):
+        cand_lines = []
+        for i, c in enumerate(considered):
+            title = (c.get("title", "") or "")[:TITLE_LIMIT]
+            snip = (c.get("snippet", "") or "")[:snip_limit]
+            line = f'[{i}] url="{compact_url(c.get("url", ""))}" title="{title}"'
+            cand_lines.append(line + (f' snippet="{snip}"' if snip else ""))
+        if head_len + sum(len(x) + 1 for x in cand_lines) <= budget:
+            break
+    while len(cand_lines) > 1 and head_len + sum(len(x) + 1 for x in cand_lines) > budget:
+        cand_lines.pop()
+    return "\n".join(lines + cand_lines)
+
+
+CONFIDENCE_LABELS = ("entity", "country", "group", "null")
+
+# Structured-output schema of one openai_choose answer (strict mode: every key required, no extras)
+CHOICE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "index": {"type": "integer"},
+        "company": {"type": "string"},
+        "chosen_domain": {"type": "string"},
+        "chosen_from_url": {"type": "string"},
+        "found_domain": {"type": "string"},
+        "confidence": {"type": "string", "enum": list(CONFIDENCE_LABELS)},
+        "reason": {"type": "string"},
+    },
+    "required": ["index", "company", "chosen_domain", "chosen_from_url", "found_domain", "confidence", "reason"],
+    "additionalProperties": False,
+}
 
-async def openai_choose(session: aiohttp.ClientSession, index: int, company: str, context: dict, candidates: list):
-    body = {
-        "model": settings.OPENAI_MODEL, "temperature": 0,
-        "messages": [
-            {"role": "system", "content": SYSTEM_INSTRUCTION + "\n" + STRICT_RETURN_INSTR},
-            {"role": "user", "content": build_user_prompt(index, company, context, candidates)}
-        ]
-    }
-    status, data = await post_json_with_retries(session, settings.OPENAI_URL, openai_headers(), body,
-                                                 tag="openai-choose")
-    if status != 200 or not isinstance(data, dict) or "choices" not in data or not data["choices"]:
-        raise RuntimeError(f"OpenAI choose failed — HTTP {status} / {str(data)[:800]}")
-    txt = (data["choices"][0]["message"]["content"] or "").strip()
+# Models that answered HTTP 400 to response_format=json_schema; they get the prompt-only path
+_structured_unsupported: Set[str] = set()
+
+
+def choice_response_format() -> dict:
+    return {"type": "json_schema", "json_schema": {"name": "domain_choice", "strict": True, "schema": CHOICE_SCHEMA}}
+
+
+def validate_choice(obj) -> Tuple[Optional[dict], str]:
+    """Normalized choice, or None and the reason it was rejected"""
+    if not isinstance(obj, dict):
+        return None, "not a JSON object"
+    if "chosen_domain" not in obj:
+        return None, "missing chosen_domain"
+    for k in ("chosen_domain", "chosen_from_url", "chosen_url", "found_domain", "reason"):
+        if obj.get(k) is not None and not isinstance(obj[k], str):
+            return None, f"{k} must be a string"
+    conf = str(obj.get("confidence") or "null").strip().lower()
+    if conf not in CONFIDENCE_LABELS:
+        return None, f"confidence must be one of {', '.join(CONFIDENCE_LABELS)}"
+    return {
+        "chosen_domain": obj.get("chosen_domain") or "null",
+        "chosen_from_url": obj.get("chosen_from_url") or obj.get("chosen_url") or "",
+        "found_domain": obj.get("found_domain") or "null",
+        "confidence": conf,
+        "reason": obj.get("reason") or "",
+    }, ""
+
+
+def parse_choice(message: dict, structured: bool) -> Tuple[Optional[dict], str]:
+    if message.get("refusal"):
+        return None, "refused"
+    txt = (message.get("content") or "").strip()
     try:
-        obj = json.loads(extract_first_json(txt))
-        return {
-            "chosen_domain": str(obj.get("chosen_domain") or "null"),
-            "chosen_from_url": str(obj.get("chosen_from_url") or obj.get("chosen_url") or ""),
-            "found_domain": str(obj.get("found_domain") or "null"),
-            "confidence": str(obj.get("confidence") or "null").lower(),
-            "reason": str(obj.get("reason") or "")
-        }
+        obj = json.loads(txt if structured else extract_first_json(txt))
     except Exception:
-        return {"chosen_domain": "null", "chosen_from_url": "", "found_domain": "null", "confidence": "null",
-                "reason": "openai-parse-fail"}
+        return None, "invalid JSON"
+    return validate_choice(obj)
+
+
+def add_usage(total: dict, usage: dict) -> dict:
+    for k in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        if usage.get(k):
+            total[k] = total.get(k, 0) + int(usage[k])
+    return total
+
+
+async def openai_choose(session: aiohttp.ClientSession, index: int, company: str, context: dict, candidates: list,
+                        model: str = None):
+    """One choice per call: JSON-schema structured output when the model supports it, else prompt + regex
+    extraction; an answer failing validation is asked again (OPENAI_PARSE_RETRIES) with the error quoted"""
+    model = model or settings.OPENAI_MODEL
+    messages = [
+        {"role": "system", "content": SYSTEM_INSTRUCTION + "\n" + STRICT_RETURN_INSTR},
+        {"role": "user", "content": build_user_prompt(index, company, context, candidates)}
+    ]
+    usage = {}
+    for attempt in range(settings.OPENAI_PARSE_RETRIES + 1):
+        structured = settings.OPENAI_STRUCTURED_OUTPUT and model not in _structured_unsupported
+        body = {"model": model, "temperature": 0, "messages": messages}
+        if structured:
+            body["response_format"] = choice_response_format()
+        hedge = {}
+        status, data = await hedger.run("openai-choose", lambda: post_json_with_retries(
+            session, settings.OPENAI_URL, openai_headers(), body, tag="openai-choose"), gate=hedge_gate(), info=hedge)
+        if status == 400 and structured and ("response_format" in str(data) or "json_schema" in str(data)):
+            # Model without structured outputs: remember it and resend prompt-only
+            _structured_unsupported.add(model)
+            count(LLM_PARSE, mode="structured", result="unsupported")
+            structured = False
+            body.pop("response_format")
+            hedge = {}
+            status, data = await hedger.run("openai-choose", lambda: post_json_with_retries(
+                session, settings.OPENAI_URL, openai_headers(), body, tag="openai-choose"), gate=hedge_gate(),
+                info=hedge)
+        if status != 200 or not isinstance(data, dict) or "choices" not in data or not data["choices"]:
+            raise RuntimeError(f"OpenAI choose failed — HTTP {status} / {str(data)[:800]}")
+        call_usage = data.get("usage") or {}
+        if call_usage:
+            count(OPENAI_TOKENS, int(call_usage.get("prompt_tokens") or 0), kind="prompt")
+            count(OPENAI_TOKENS, int(call_usage.get("completion_tokens") or 0), kind="completion")
+        add_usage(usage, call_usage)
+        if hedge.get("hedged") and call_usage.get("prompt_tokens"):
+            # The cancelled duplicate read the same prompt; its completion was cut short, so bill the prompt only
+            hedge_prompt = int(call_usage["prompt_tokens"])
+            count(OPENAI_TOKENS, hedge_prompt, kind="hedge_prompt")
+            usage["hedge_prompt_tokens"] = usage.get("hedge_prompt_tokens", 0) + hedge_prompt
+        message = data["choices"][0].get("message") or {}
+        choice, error = parse_choice(message, structured)
+        mode = "structured" if structured else "prompt"
+        if choice is not None:
+            count(LLM_PARSE, mode=mode, result="ok" if attempt == 0 else "retried_ok")
+            choice["usage"] = usage
+            return choice
+        count(LLM_PARSE, mode=mode, result="invalid")
+        messages = messages[:2] + [
+            {"role": "assistant", "content": message.get("content") or ""},
+            {"role": "user", "content": f"Your answer was rejected ({error}). " + STRICT_RETURN_INSTR},
+        ]
+    return {"chosen_domain": "null", "chosen_from_url": "", "found_domain": "null", "confidence": "null",
+            "reason": "openai-parse-fail", "usage": usage}
 
 
-async def serper_search(session: aiohttp.ClientSession, limiter: RPSLimiter, query: str, ctx: dict, num: int = 10):
+async def search_request(session: aiohttp.ClientSession, limiter: RPSLimiter, url: str, headers: dict, query: str,
+                         ctx: dict, num: int = 10, results_key: str = "organic", tag: str = "serper-search",
+                         max_retries: int = None) -> Tuple[Optional[int], list]:
+    """POST a Serper-style query; returns the HTTP status (None once retries ran out) and the result list"""
     await limiter.acquire()
     gl, hl = guess_gl_hl(ctx)
     body = {"q": query, "num": max(1, min(100, int(num)))}
@@ -690,14 +1345,18 @@ async def serper_search(session: aiohttp.ClientSession, limiter: RPSLimiter, que
         body["gl"] = gl
     if hl:
         body["hl"] = hl
+    status, data = await hedger.run(tag, lambda: post_json_with_retries(
+        session, url, headers, body, tag=tag, max_retries=max_retries), gate=hedge_gate(limiter))
+    if status != 200 or not isinstance(data, dict):
+        return status, []
+    results = data.get(results_key) or []
+    return status, results if isinstance(results, list) else []
+
+
+async def serper_search(session: aiohttp.ClientSession, limiter: RPSLimiter, query: str, ctx: dict, num: int = 10):
     headers = {"Content-Type": "application/json", "X-API-KEY": settings.SERPER_API_KEY}
-    status, data = await post_json_with_retries(session, settings.SERPER_SEARCH_URL, headers, body, tag="serper-search")
-    if status != 200 or data is None:
-        return []
-    if isinstance(data, dict):
-        results = data.get("organic") or []
-        return results if isinstance(results, list) else []
-    return []
+    _, results = await search_request(session, limiter, settings.SERPER_SEARCH_URL, headers, query, ctx, num)
+    return results
 
 
 # -------------------- CSV & Data Helpers --------------------
@@ -724,30 +1383,261 @@ def detect_context_columns(df: pd.DataFrame):
     return cols
 
 
+OUTPUT_COLUMNS = ("URL", "URL_confidence_score", "URL_ambiguity", "URL_cand_count",
+                  "URL_reg_match", "URL_reg_ids_found", "URL_debug", "URL_found_domain")
+
+
 def init_output(df):
-    if "URL" not in df.columns:
-        df["URL"] = ""
-    # Add debug columns
-    add_cols = ("URL_confidence_score", "URL_ambiguity", "URL_cand_count",
-                "URL_reg_match", "URL_reg_ids_found", "URL_debug", "URL_found_domain")
-    for col in add_cols:
+    # URL plus debug columns
+    for col in OUTPUT_COLUMNS:
         if col not in df.columns:
             df[col] = ""
     return df
 
 
+# -------------------- Knowledge Index --------------------
+KNOWLEDGE_REASON = "knowledge-index"
+
+
+def country_code(ctx: dict) -> str:
+    gl, _ = guess_gl_hl(ctx)
+    return (gl or "").upper()
+
+
+def knowledge_entries(df: pd.DataFrame) -> List[dict]:
+    """Confident rows of an enriched frame, ready for KnowledgeIndex.upsert_many"""
+    company_col = find_company_col(df)
+    context_cols = [c for c in detect_context_columns(df) if c != company_col]
+    ctx_values = [df[c].tolist() for c in context_cols]
+    out = []
+    for pos, (company, url, score, reg, debug) in enumerate(zip(
+            df[company_col].tolist(), df["URL"].tolist(), df["URL_confidence_score"].tolist(),
+            df["URL_reg_match"].tolist(), df["URL_debug"].tolist())):
+        domain = strip_to_domain(safe_json(url))
+        if not domain:
+            continue
+        try:
+            score = int(float(score))
+        except (TypeError, ValueError):
+            score = 0
+        reg_match = safe_json(reg) == "yes"
+        if score < settings.KNOWLEDGE_MIN_SCORE and not reg_match:
+            continue
+        # Rows answered by the index itself are not re-learned (no fuzzy drift)
+        if KNOWLEDGE_REASON in safe_json(debug):
+            continue
+        ctx = {c: v[pos] for c, v in zip(context_cols, ctx_values) if safe_json(v[pos])}
+        tokens = name_tokens(safe_json(company))
+        if tokens:
+            out.append({"tokens": tokens, "country": country_code(ctx), "company": safe_json(company),
+                        "domain": domain, "score": score, "reg_match": reg_match})
+    return out
+
+
+def learn_from_results(df: pd.DataFrame, provenance: str, index=None) -> int:
+    if not settings.ENABLE_KNOWLEDGE_INDEX:
+        return 0
+    return (index or knowledge_index).upsert_many(knowledge_entries(df), provenance=provenance)
+
+
+# -------------------- Row Records --------------------
+class RowRecord:
+    """Inputs of one pending row, extracted once from the frame"""
+    __slots__ = ("pos", "company", "ctx")
+
+    def __init__(self, pos: int, company: str, ctx: dict):
+        self.pos = pos
+        self.company = company
+        self.ctx = ctx
+
+
+def extract_records(df: pd.DataFrame, company_col: str, context_cols: List[str]) -> List[RowRecord]:
+    """RowRecords for rows whose URL is still empty"""
+    url = df["URL"]
+    pending = (url.isna() | (url.astype(str).str.strip() == "")).to_numpy().nonzero()[0].tolist()
+    companies = df[company_col].tolist()
+    ctx_values = [(c, df[c].tolist()) for c in context_cols]
+    records = []
+    for pos in pending:
+        company = companies[pos]
+        company = str(company).strip() if pd.notna(company) else ""
+        ctx = {c: values[pos] for c, values in ctx_values if pd.notna(values[pos])}
+        records.append(RowRecord(pos, company, ctx))
+    # Normalize names and short context values column-wise so scoring and cache keys hit the token cache
+    prime_name_tokens(dict.fromkeys(r.company for r in records))
+    for c, values in ctx_values:
+        if str(c).lower().strip() in CTX_LOCATION | CTX_SECTOR:
+            prime_name_tokens(dict.fromkeys(str(r.ctx[c]) for r in records if c in r.ctx))
+    return records
+
+
+class RowResults:
+    """Output columns as preallocated lists, written by position and assigned to the frame once"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.values = {col: df[col].tolist() for col in OUTPUT_COLUMNS}
+
+    def write(self, pos: int, res: dict):
+        v = self.values
+        v["URL"][pos] = res["domain"]
+        v["URL_confidence_score"][pos] = res["score"]
+        v["URL_ambiguity"][pos] = res["ambiguity"]
+        v["URL_cand_count"][pos] = res["cand_count"]
+        v["URL_reg_match"][pos] = "yes" if res["reg_match"] else "no"
+        v["URL_reg_ids_found"][pos] = res["reg_ids"]
+        v["URL_debug"][pos] = json.dumps(
+            {"chosen_obj_title": res["chosen_title"], "chosen_obj_snippet": res["chosen_snippet"],
+             "reason": res["reason"]},
+            ensure_ascii=False)
+        v["URL_found_domain"][pos] = res["found_domain"]
+
+    def frame(self, df: pd.DataFrame, positions: List[int]) -> pd.DataFrame:
+        """Finished rows (inputs + outputs) for checkpoints"""
+        rows = df.iloc[positions].copy()
+        for col in OUTPUT_COLUMNS:
+            values = self.values[col]
+            rows[col] = pd.Series([values[p] for p in positions], index=rows.index, dtype=object)
+        return rows
+
+    def materialize(self, df: pd.DataFrame):
+        for col in OUTPUT_COLUMNS:
+            df[col] = pd.Series(self.values[col], index=df.index, dtype=object)
+
+
+class RowWork:
+    """A row moving through the pipeline stages"""
+    __slots__ = ("rec", "clock", "started", "queued", "candidates", "heur", "g", "res")
+
+    def __init__(self, rec: RowRecord):
+        self.rec = rec
+        self.clock = RowClock()
+        self.started = self.queued = time.perf_counter()
+        self.candidates = []
+        self.heur = None
+        self.g = None
+        self.res = None
+
+
 # -------------------- Main Enrichment Class --------------------
+class JobStopped(Exception):
+    """Raised inside a row when the job is cancelled; the row stays pending"""
+
+
+class JobControl:
+    """Pause / resume / cancel switch shared by a job's workers and the API"""
+
+    def __init__(self):
+        self._running = asyncio.Event()
+        self._running.set()
+        self.cancelled = False
+        self.pause_reason = ""
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set() and not self.cancelled
+
+    def pause(self, reason: str = "user"):
+        if not self.cancelled:
+            self.pause_reason = reason
+            self._running.clear()
+
+    def resume(self):
+        self.pause_reason = ""
+        self._running.set()
+
+    def cancel(self):
+        self.cancelled = True
+        self._running.set()  # wake paused workers so they can exit
+
+    async def checkpoint(self):
+        """Wait while paused; raise JobStopped once cancelled"""
+        if not self._running.is_set():
+            await self._running.wait()
+        if self.cancelled:
+            raise JobStopped()
+
+
 class EnrichmentEngine:
-    def __init__(self, progress_callback=None):
+    def __init__(self, progress_callback=None, checkpoint_callback=None, clients=None, usage=None, knowledge=None,
+                 scheduler=None, job_key: str = None, priority: str = "normal", control: JobControl = None,
+                 search=None):
         self.progress_callback = progress_callback
+        self.checkpoint_callback = checkpoint_callback
+        self.clients = clients or client_manager
+        self.knowledge = knowledge or knowledge_index
+        # Optional process-wide ProviderScheduler; without one the job owns the full provider budgets
+        self.scheduler = scheduler
+        self.job_key = job_key or f"job-{id(self):x}"
+        self.priority = priority
+        self.usage = usage or JobUsage()
+        self.control = control or JobControl()
+        # Optional SearchRouter (backend/search_providers.py); without one queries go straight to Serper
+        self.search = search
+        self.race_search = False
         self.search_cache = {}
         self.llm_cache = {}
         self.openai_unhealthy = asyncio.Event()
+        self._checkpoint_pending = []
+        self.job_metrics = JobMetrics()
 
     async def update_progress(self, current: int, total: int, message: str = ""):
         if self.progress_callback:
             await self.progress_callback(current, total, message)
 
+    async def ensure_openai_ready(self):
+        """Preflight OpenAI unless a call succeeded within OPENAI_HEALTH_TTL_SEC"""
+        await self.clients.start()
+        if self.clients.openai_recently_healthy():
+            return
+        if not await openai_preflight(self.clients.openai):
+            self.clients.mark_openai_unhealthy()
+            raise RuntimeError("OpenAI preflight failed")
+        self.clients.mark_openai_healthy()
+
+    async def spend_gate(self) -> str:
+        """Called before each paid call (and before taking a provider slot).
+
+        Waits while the job is paused, raises JobStopped once it is cancelled, and pauses the job itself when the
+        budget is exhausted with action=pause (resume after raising the budget).
+        """
+        await self.control.checkpoint()
+        state = self.usage.check_budget()
+        while state == "pause":
+            self.control.pause("budget")
+            await self.control.checkpoint()
+            state = self.usage.check_budget()
+        return state
+
+    @asynccontextmanager
+    async def provider_slot(self, sem):
+        """Hold a provider slot (semaphore or scheduler lane), handing it straight back while the job is paused"""
+        while True:
+            await self.control.checkpoint()
+            await sem.__aenter__()
+            if not self.control.paused and not self.control.cancelled:
+                break
+            await sem.__aexit__(None, None, None)
+        # A hedged duplicate sent from inside this slot takes a slot of its own
+        token = _provider_slot.set(lambda: self.provider_slot(sem))
+        try:
+            yield
+        finally:
+            _provider_slot.reset(token)
+            await sem.__aexit__(None, None, None)
+
+    async def flush_checkpoint(self, out_df: pd.DataFrame, out: "RowResults"):
+        """Hand rows finished since the last checkpoint to the checkpoint callback"""
+        if not self.checkpoint_callback or not self._checkpoint_pending:
+            self._checkpoint_pending = []
+            return
+        positions, self._checkpoint_pending = self._checkpoint_pending, []
+        try:
+            await self.checkpoint_callback(out.frame(out_df, positions))
+        except Exception as e:
+            # Keep the rows for the next flush rather than losing them from the partial file
+            logger.warning(f"Checkpoint of {len(positions)} rows failed: {e}")
+            self._checkpoint_pending = positions + self._checkpoint_pending
+
     async def legal_check_for_candidates(self, candidates: list, reg_expected: dict):
         loop = asyncio.get_running_loop()
         results = {}
@@ -757,11 +1647,19 @@ class EnrichmentEngine:
             if not dom:
                 continue
             tasks.append(loop.run_in_executor(None, crawl_registration_for_domain, dom))
-        done = await asyncio.gather(*tasks, return_exceptions=True)
+        if tasks:
+            try:
+                async with stage_deadline("crawl"):
+                    await asyncio.wait(tasks)
+            except DeadlineExceeded:
+                # Keep the domains crawled in time; the stragglers finish in their threads and are ignored
+                pass
+        done = [t.result() for t in tasks if t.done() and not t.cancelled() and t.exception() is None]
         for item in done:
             try:
                 if isinstance(item, dict) and "domain" in item:
                     results[item["domain"]] = item
+                    self.usage.add_crawl_pages(item.get("pages_fetched", 0))
             except Exception:
                 pass
         best = None
@@ -773,21 +1671,226 @@ class EnrichmentEngine:
                 break
         return results, best
 
-    async def process_row(self, idx, row, session_serp, session_oa, serp_limiter, sem_serp, sem_oa,
-                          out_df, company_col, context_cols, processed_count, total_count):
-        # Check if URL already exists (avoid Series ambiguity)
-        if pd.notna(row.get("URL")) and str(row["URL"]).strip():
-            return
+    def write_empty(self, rec: RowRecord, out: RowResults):
+        out.values["URL"][rec.pos] = ""
+        self._checkpoint_pending.append(rec.pos)
+        count(ROWS_PROCESSED, outcome="empty")
+
+    async def record_row(self, rec: RowRecord, res: dict, out: RowResults, processed_count, total_count):
+        count(ROWS_PROCESSED, outcome="found" if res["domain"] else "not_found")
+
+        # Write row
+        with span("row_write"):
+            out.write(rec.pos, res)
+        self._checkpoint_pending.append(rec.pos)
+
+        # Update progress
+        company = rec.company
+        await self.update_progress(processed_count[0] + 1, total_count,
+                                   f"Processing: {company[:30]}{'...' if len(company) > 30 else ''}")
+        processed_count[0] += 1
 
-        company = str(row[company_col]).strip() if pd.notna(row[company_col]) else ""
+    async def process_row(self, rec: RowRecord, session_serp, session_oa, serp_limiter, sem_serp, sem_oa,
+                          out: RowResults, processed_count, total_count):
+        """All stages of one row in a single task (used when ENABLE_PIPELINE is off)"""
+        company = rec.company
         if not company:
-            out_df.at[idx, "URL"] = ""
+            self.write_empty(rec, out)
             return
 
         if self.openai_unhealthy.is_set():
             return
 
-        ctx = {c: row[c] for c in context_cols if pd.notna(row.get(c, ""))}
+        _row_clock.set(RowClock())
+        try:
+            await self.control.checkpoint()
+            with span("row_total"):
+                res = await self.resolve_company(rec.pos, company, rec.ctx, session_serp, session_oa, serp_limiter,
+                                                 sem_serp, sem_oa)
+        except JobStopped:
+            # Row stays pending; partial results are kept
+            return
+        await self.record_row(rec, res, out, processed_count, total_count)
+
+    async def run_pipeline(self, records: List[RowRecord], session_serp, session_oa, serp_limiter, sem_serp, sem_oa,
+                           out: RowResults, processed_count, total_count):
+        """Stage pipeline: search (pre-resolution, SERP ladder, local choice) -> LLM decision -> validation/crawl
+        and write. Each stage has its own workers behind a bounded queue, so SERP and OpenAI stay busy for the
+        whole job instead of OpenAI idling early and SERP idling late."""
+        n_search = max(1, settings.PIPELINE_SEARCH_WORKERS or settings.SERP_CONCURRENCY)
+        n_llm = max(1, settings.PIPELINE_LLM_WORKERS or settings.OPENAI_CONCURRENCY)
+        n_final = max(1, settings.PIPELINE_FINALIZE_WORKERS)
+        llm_q = asyncio.Queue(settings.PIPELINE_QUEUE_SIZE or 2 * n_llm)
+        final_q = asyncio.Queue(settings.PIPELINE_QUEUE_SIZE or 2 * n_final)
+        feed = iter(records)
+
+        def enter(work: RowWork, queue_stage: str):
+            observe(queue_stage, time.perf_counter() - work.queued)
+            _row_clock.set(work.clock)
+
+        async def search_worker():
+            for rec in feed:
+                if self.openai_unhealthy.is_set() or self.control.cancelled:
+                    return
+                if not rec.company:
+                    self.write_empty(rec, out)
+                    continue
+                work = RowWork(rec)
+                _row_clock.set(work.clock)
+                try:
+                    await self.control.checkpoint()
+                    with span("stage_search"):
+                        work.res = await self.pre_resolve(rec.company, rec.ctx)
+                        if work.res is None:
+                            work.candidates = await self.search_candidates(rec.company, rec.ctx, session_serp,
+                                                                           serp_limiter, sem_serp)
+                            work.g, work.heur = self.local_choice(rec.company, rec.ctx, work.candidates)
+                except JobStopped:
+                    continue
+                work.queued = time.perf_counter()
+                await (llm_q if work.res is None and work.g is None else final_q).put(work)
+
+        async def llm_worker():
+            while (work := await llm_q.get()) is not None:
+                enter(work, "queue_llm")
+                try:
+                    await self.control.checkpoint()
+                    with span("stage_llm"):
+                        work.g = await self.llm_decision(work.rec.pos, work.rec.company, work.rec.ctx,
+                                                         work.candidates, work.heur, session_oa, sem_oa)
+                except JobStopped:
+                    continue
+                work.queued = time.perf_counter()
+                await final_q.put(work)
+
+        async def finalize_worker():
+            while (work := await final_q.get()) is not None:
+                enter(work, "queue_finalize")
+                try:
+                    if work.res is None:
+                        await self.control.checkpoint()
+                        with span("stage_finalize"):
+                            work.res = await self.finalize(work.rec.company, work.rec.ctx, work.candidates, work.g)
+                except JobStopped:
+                    continue
+                observe("row_total", time.perf_counter() - work.started)
+                await self.record_row(work.rec, work.res, out, processed_count, total_count)
+
+        async def drain(producers: list, queue: asyncio.Queue, consumers: int):
+            await asyncio.gather(*producers)
+            for _ in range(consumers):
+                await queue.put(None)
+
+        search_tasks = [asyncio.create_task(search_worker()) for _ in range(n_search)]
+        llm_tasks = [asyncio.create_task(llm_worker()) for _ in range(n_llm)]
+        final_tasks = [asyncio.create_task(finalize_worker()) for _ in range(n_final)]
+        try:
+            await asyncio.gather(drain(search_tasks, llm_q, n_llm), drain(llm_tasks, final_q, n_final), *final_tasks)
+        finally:
+            for t in search_tasks + llm_tasks + final_tasks:
+                if not t.done():
+                    t.cancel()
+
+    @staticmethod
+    def preresolved(domain: str, score, reason: str) -> dict:
+        return {
+            "domain": domain,
+            "score": score,
+            "confidence": "entity",
+            "reason": reason,
+            "ambiguity": 0,
+            "cand_count": 0,
+            "reg_match": False,
+            "reg_ids": "",
+            "chosen_title": "",
+            "chosen_snippet": "",
+            "found_domain": "",
+        }
+
+    async def knowledge_lookup(self, company: str, ctx: dict) -> Optional[dict]:
+        # SQLite reads (and the fuzzy scoring) run in a worker thread, off the event loop
+        loop = asyncio.get_running_loop()
+        try:
+            hit = await loop.run_in_executor(None, self.knowledge.lookup, name_tokens(company), country_code(ctx))
+        except Exception:
+            hit = None
+        count(CACHE_LOOKUPS, cache="knowledge", result="hit" if hit else "miss")
+        return hit
+
+    async def pre_resolve(self, company: str, ctx: dict) -> Optional[dict]:
+        """Accept a known domain (local index, context column or name) without SERP or LLM"""
+        if not settings.ENABLE_KNOWLEDGE_INDEX and not settings.ENABLE_PRERESOLVE:
+            return None
+        with span("pre_resolve"):
+            if settings.ENABLE_KNOWLEDGE_INDEX:
+                hit = await self.knowledge_lookup(company, ctx)
+                if hit is not None:
+                    count(PRERESOLVED, source=KNOWLEDGE_REASON)
+                    score = int(round(hit["score"] * hit["similarity"]))
+                    return self.preresolved(hit["domain"], max(1, min(100, score)),
+                                            f"{KNOWLEDGE_REASON}:{hit['match']} ({hit['provenance']})")
+            if not settings.ENABLE_PRERESOLVE:
+                return None
+            sources = [(d, "context-domain") for d in context_domains(ctx)]
+            nd = name_domain(company)
+            if nd:
+                sources.insert(0, (nd, "name-is-domain"))
+            for dom, source in sources:
+                if source == "context-domain" and not homonym_guard(company, dom, "entity"):
+                    continue
+                if settings.PRERESOLVE_DNS_CHECK and not await dns_resolves(dom):
+                    continue
+                count(PRERESOLVED, source=source)
+                return self.preresolved(dom, settings.PRERESOLVE_SCORE, source)
+        return None
+
+    async def llm_choose(self, idx, company: str, ctx: dict, candidates: list, session_oa, sem_oa,
+                         tier: str = "main") -> dict:
+        """Cached OpenAI choice among the candidates (one cache entry per model tier)"""
+        model = tier_model(tier)
+        try:
+            lkey = (model, company, tuple(sorted((str(k), str(ctx[k])) for k in ctx)),
+                    tuple((c.get("url", ""), c.get("domain", "")) for c in candidates[:settings.MAX_CANDIDATES_PER_COMPANY]))
+            if lkey in self.llm_cache:
+                g = self.llm_cache[lkey]
+                count(CACHE_LOOKUPS, cache="llm", result="hit")
+                self.usage.add_llm_cache_hit(g.get("usage"), tier)
+            else:
+                await self.spend_gate()
+                count(CACHE_LOOKUPS, cache="llm", result="miss")
+                async with self.provider_slot(sem_oa):
+                    with span("openai_choose"):
+                        async with stage_deadline("llm"):
+                            g = await openai_choose(session_oa, idx, company, ctx, candidates, model=model)
+                self.usage.add_openai_call(g.get("usage"), tier)
+                self.llm_cache[lkey] = g
+                self.clients.mark_openai_healthy()
+        except JobStopped:
+            raise
+        except DeadlineExceeded as e:
+            # A slow answer is not an unhealthy API: the row goes on without an LLM choice (not cached)
+            return {"chosen_domain": "null", "chosen_from_url": "", "found_domain": "null", "confidence": "null",
+                    "reason": f"{e.stage}-deadline"}
+        except Exception as e:
+            self.clients.mark_openai_unhealthy()
+            self.openai_unhealthy.set()
+            raise RuntimeError(f"OpenAI error: {str(e)[:1200]}")
+        return g
+
+    async def resolve_company(self, idx, company: str, ctx: dict, session_serp, session_oa, serp_limiter,
+                              sem_serp, sem_oa) -> dict:
+        """Search, LLM choice, scoring and registration check for one company (all stages inline)"""
+        pre = await self.pre_resolve(company, ctx)
+        if pre is not None:
+            return pre
+        candidates = await self.search_candidates(company, ctx, session_serp, serp_limiter, sem_serp)
+        g, heur = self.local_choice(company, ctx, candidates)
+        if g is None:
+            g = await self.llm_decision(idx, company, ctx, candidates, heur, session_oa, sem_oa)
+        return await self.finalize(company, ctx, candidates, g)
+
+    async def search_candidates(self, company: str, ctx: dict, session_serp, serp_limiter, sem_serp) -> list:
+        """SERP query ladder, filtered and deduplicated candidates"""
         non_reg_ctx_bits = []
         for k, v in ctx.items():
             kl = str(k).lower()
@@ -805,59 +1908,95 @@ class EnrichmentEngine:
             return (q, gl, hl, num, page)
 
         # SERP candidates
-        candidates = []
-        try:
-            tried = set()
-            queries = [
-                q,
-                company + " website",
-                f'"{company}" website',
-                f'"{company}" official website',
-                f"{company} site web",
-                f"{company} site officiel",
-            ]
-            for qtry in queries:
-                key = search_cache_key(qtry, ctx, settings.SEARCH_RESULTS_PER_CALL, 1)
-                if key in tried:
-                    continue
-                tried.add(key)
-
-                if key in self.search_cache:
-                    cand = self.search_cache[key]
-                else:
-                    async with sem_serp:
-                        results = await serper_search(session_serp, serp_limiter, qtry, ctx,
-                                                      num=settings.SEARCH_RESULTS_PER_CALL)
-                    cand = filter_candidates(results)
-                    self.search_cache[key] = cand
-
-                if cand:
-                    have = {c["domain"] for c in candidates}
-                    for c in cand:
-                        if c["domain"] not in have:
-                            candidates.append(c)
-                            have.add(c["domain"])
-
-                if len(candidates) >= settings.MAX_CANDIDATES_PER_COMPANY:
-                    candidates = candidates[:settings.MAX_CANDIDATES_PER_COMPANY]
-                    break
-        except Exception:
+        with span("serp_ladder"):
             candidates = []
-
-        # LLM choose
-        try:
-            lkey = (company, tuple(sorted((str(k), str(ctx[k])) for k in ctx)),
-                    tuple((c.get("url", ""), c.get("domain", "")) for c in candidates[:settings.MAX_CANDIDATES_PER_COMPANY]))
-            if lkey in self.llm_cache:
-                g = self.llm_cache[lkey]
-            else:
-                async with sem_oa:
-                    g = await openai_choose(session_oa, idx, company, ctx, candidates)
-                self.llm_cache[lkey] = g
-        except Exception as e:
-            self.openai_unhealthy.set()
-            raise RuntimeError(f"OpenAI error: {str(e)[:1200]}")
-
+            try:
+                tried = set()
+                queries = [
+                    q,
+                    company + " website",
+                    f'"{company}" website',
+                    f'"{company}" official website',
+                    f"{company} site web",
+                    f"{company} site officiel",
+                ]
+                for qtry in queries:
+                    key = search_cache_key(qtry, ctx, settings.SEARCH_RESULTS_PER_CALL, 1)
+                    if key in tried:
+                        continue
+                    tried.add(key)
+
+                    if key in self.search_cache:
+                        cand = self.search_cache[key]
+                        count(CACHE_LOOKUPS, cache="search", result="hit")
+                        self.usage.add_search_cache_hit()
+                    else:
+                        # Over budget in degrade mode: keep only the first ladder queries
+                        if await self.spend_gate() == "degrade" and len(tried) > settings.BUDGET_DEGRADED_LADDER_QUERIES:
+                            break
+                        count(CACHE_LOOKUPS, cache="search", result="miss")
+                        async with self.provider_slot(sem_serp):
+                            async with stage_deadline("serp"):
+                                if self.search is not None:
+                                    results, billed = await self.search.search(
+                                        session_serp, serp_limiter, qtry, ctx, num=settings.SEARCH_RESULTS_PER_CALL,
+                                        race=self.race_search)
+                                else:
+                                    results, billed = await serper_search(session_serp, serp_limiter, qtry, ctx,
+                                                                          num=settings.SEARCH_RESULTS_PER_CALL), 1
+                        self.usage.add_serper_query(billed)
+                        cand = filter_candidates(results)
+                        self.search_cache[key] = cand
+
+                    if cand:
+                        have = {c.get("site") or c["domain"] for c in candidates}
+                        for c in cand:
+                            site = c.get("site") or c["domain"]
+                            if site not in have:
+                                candidates.append(c)
+                                have.add(site)
+
+                    if len(candidates) >= settings.MAX_CANDIDATES_PER_COMPANY:
+                        candidates = candidates[:settings.MAX_CANDIDATES_PER_COMPANY]
+                        break
+            except JobStopped:
+                raise
+            except DeadlineExceeded:
+                # Out of SERP time: go on with the candidates gathered so far
+                pass
+            except Exception:
+                candidates = []
+        return candidates
+
+    @staticmethod
+    def local_choice(company: str, ctx: dict, candidates: list) -> Tuple[Optional[dict], Optional[dict]]:
+        """(choice, heuristic pick): an unambiguous candidate is decided without the LLM unless sampled for audit"""
+        heur = heuristic_choice(company, ctx, candidates) if settings.ENABLE_HEURISTIC_CHOICE else None
+        if settings.ENABLE_HEURISTIC_CHOICE:
+            count(HEURISTIC_DECISIONS, outcome="accepted" if heur else "deferred")
+        if heur is None or random.random() < settings.HEURISTIC_AUDIT_RATE:
+            return None, heur
+        return {"chosen_domain": heur["domain"], "chosen_from_url": heur["url"], "found_domain": "null",
+                "confidence": "entity", "reason": "heuristic"}, heur
+
+    async def llm_decision(self, idx, company: str, ctx: dict, candidates: list, heur: Optional[dict], session_oa,
+                           sem_oa) -> dict:
+        """LLM choice (through the model cascade when enabled); heur is compared for the audit when given"""
+        if cascade_enabled():
+            g = await self.llm_choose(idx, company, ctx, candidates, session_oa, sem_oa, tier="fast")
+            escalate = escalation_reason(company, candidates, g)
+            count(MODEL_CASCADE, outcome=escalate or "kept")
+            if escalate:
+                g = await self.llm_choose(idx, company, ctx, candidates, session_oa, sem_oa)
+        else:
+            g = await self.llm_choose(idx, company, ctx, candidates, session_oa, sem_oa)
+        if heur is not None:
+            llm_dom = strip_to_domain(g.get("chosen_domain") or "") or strip_to_domain(g.get("found_domain") or "")
+            count(HEURISTIC_AUDIT, result="agree" if llm_dom == strip_to_domain(heur["domain"]) else "disagree")
+        return g
+
+    async def finalize(self, company: str, ctx: dict, candidates: list, g: dict) -> dict:
+        """Recovery, DNS/homonym validation, scoring and registration crawl of a decided row"""
         dom_raw = (g.get("chosen_domain") or "null").strip().lower()
         conf_label = (g.get("confidence") or "null").strip().lower()
         reason = (g.get("reason") or "").strip()
@@ -895,37 +2034,44 @@ class EnrichmentEngine:
             d = strip_to_domain(dom_raw)
             chosen_obj = next((c for c in candidates if strip_to_domain(c.get("domain", "")) == d),
                               {}) if candidates else {}
-            if (not d) or (settings.ENABLE_DNS_CHECK and not dns_ok(d)) or (
-                    not homonym_guard(company, d, conf_label)):
+            dns_pass = True
+            if d and settings.ENABLE_DNS_CHECK:
+                with span("dns"):
+                    dns_pass = dns_ok(d)
+            if (not d) or (not dns_pass) or (not homonym_guard(company, d, conf_label)):
                 final_domain = ""
                 numeric_score = ""
                 ambiguity = 0
             else:
-                final_domain = d
-                base_map = {"entity": 95, "country": 78, "group": 65, "null": 50}
-                base_score = base_map.get(conf_label, 50)
-                ambiguity = ambiguity_count(company, candidates, chosen_domain=d)
-                total_considered = max(1, min(len(candidates), settings.MAX_CANDIDATES_PER_COMPANY))
-                amb_ratio = min(1.0, ambiguity / total_considered)
-                brand_tokens = len(name_tokens(company))
-                amb_cap = 12 if brand_tokens <= 2 else 20
-                amb_penalty = int(round(amb_cap * amb_ratio))
-                ctx_pen = context_match_effect(company, ctx, chosen_obj)
-                ctx_bonus = context_positive_bonus(ctx, chosen_obj)
-                numeric_score = max(1, min(100, base_score - amb_penalty - ctx_pen + ctx_bonus))
-                if used_llm_found and numeric_score < 75:
-                    numeric_score = 75
+                with span("scoring"):
+                    final_domain = d
+                    base_map = {"entity": 95, "country": 78, "group": 65, "null": 50}
+                    base_score = base_map.get(conf_label, 50)
+                    ambiguity = ambiguity_count(company, candidates, chosen_domain=d)
+                    total_considered = max(1, min(len(candidates), settings.MAX_CANDIDATES_PER_COMPANY))
+                    amb_ratio = min(1.0, ambiguity / total_considered)
+                    brand_tokens = len(name_tokens(company))
+                    amb_cap = 12 if brand_tokens <= 2 else 20
+                    amb_penalty = int(round(amb_cap * amb_ratio))
+                    ctx_pen = context_match_effect(company, ctx, chosen_obj)
+                    ctx_bonus = context_positive_bonus(ctx, chosen_obj)
+                    numeric_score = max(1, min(100, base_score - amb_penalty - ctx_pen + ctx_bonus))
+                    if used_llm_found and numeric_score < 75:
+                        numeric_score = 75
 
         # Registration legal check
         reg_expected = normalize_reg_context({k: v for k, v in ctx.items() if str(k).lower() in CTX_REG})
         best_reg_match_domain = ""
         found_ids_str = ""
-        if any(reg_expected.values()) and (candidates or final_domain not in ("", "")):
+        # Legal crawl is skipped once the job is over budget (degrade mode)
+        if any(reg_expected.values()) and (candidates or final_domain not in ("", "")) and not self.usage.degraded:
             to_check = candidates.copy()
             if final_domain not in ("", ""):
                 if not any(strip_to_domain(c.get("domain", "")) == final_domain for c in to_check):
                     to_check.append({"domain": final_domain, "url": f"https://{final_domain}"})
-            reg_results, best = await self.legal_check_for_candidates(to_check, reg_expected)
+            await self.control.checkpoint()
+            with span("legal_crawl"):
+                reg_results, best = await self.legal_check_for_candidates(to_check, reg_expected)
             if best:
                 best_reg_match_domain = strip_to_domain(best[0])
                 final_domain = best_reg_match_domain
@@ -939,22 +2085,19 @@ class EnrichmentEngine:
                     reason = "registration-match"
                 conf_label = "entity"
 
-        # Write row
-        out_df.at[idx, "URL"] = final_domain
-        out_df.at[idx, "URL_confidence_score"] = numeric_score if final_domain != "" else ""
-        out_df.at[idx, "URL_ambiguity"] = ambiguity
-        out_df.at[idx, "URL_cand_count"] = len(candidates)
-        out_df.at[idx, "URL_reg_match"] = "yes" if best_reg_match_domain else "no"
-        out_df.at[idx, "URL_reg_ids_found"] = found_ids_str
-        out_df.at[idx, "URL_debug"] = json.dumps(
-            {"chosen_obj_title": chosen_obj.get("title", ""), "chosen_obj_snippet": chosen_obj.get("snippet", "")},
-            ensure_ascii=False)
-        out_df.at[idx, "URL_found_domain"] = found_dom if found_dom not in ("null", "none") else ""
-
-        # Update progress
-        await self.update_progress(processed_count[0] + 1, total_count,
-                                   f"Processing: {company[:30]}{'...' if len(company) > 30 else ''}")
-        processed_count[0] += 1
+        return {
+            "domain": final_domain,
+            "score": numeric_score if final_domain != "" else "",
+            "confidence": conf_label,
+            "reason": reason,
+            "ambiguity": ambiguity,
+            "cand_count": len(candidates),
+            "reg_match": bool(best_reg_match_domain),
+            "reg_ids": found_ids_str,
+            "chosen_title": chosen_obj.get("title", ""),
+            "chosen_snippet": chosen_obj.get("snippet", ""),
+            "found_domain": found_dom if found_dom not in ("null", "none") else "",
+        }
 
     async def enrich_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """Main enrichment method"""
@@ -963,51 +2106,67 @@ class EnrichmentEngine:
 
         out_df = init_output(df.copy())
 
-        # Preflight OpenAI
-        async with aiohttp.ClientSession() as s_pre:
-            ok = await openai_preflight(s_pre)
-            if not ok:
-                raise RuntimeError("OpenAI preflight failed")
+        # Preflight OpenAI (skipped when the shared client saw it healthy recently)
+        await self.ensure_openai_ready()
 
-        # Find rows without URLs (avoid Series ambiguity)
-        pending_indices = [i for i, r in out_df.iterrows() if
-                           not (pd.notna(r.get("URL")) and str(r["URL"]).strip())]
-        total_count = len(pending_indices)
+        # Rows without URLs, extracted once into compact records
+        records = extract_records(out_df, company_col, context_cols)
+        out = RowResults(out_df)
+        total_count = len(records)
 
         await self.update_progress(0, total_count, "Starting enrichment...")
 
-        serp_limiter = RPSLimiter(settings.SERP_MAX_RPS)
-        sem_serp = asyncio.Semaphore(settings.SERP_CONCURRENCY)
-        sem_oa = asyncio.Semaphore(settings.OPENAI_CONCURRENCY)
-
-        connector_serp = aiohttp.TCPConnector(limit=settings.SERP_CONCURRENCY * 2, ssl=False)
-        connector_oa = aiohttp.TCPConnector(limit=settings.OPENAI_CONCURRENCY * 2, ssl=False)
+        if self.scheduler is not None:
+            lanes = self.scheduler.register(self.job_key, self.priority)
+            serp_limiter, sem_serp, sem_oa = self.scheduler.serp_limiter(), lanes.serp, lanes.openai
+        else:
+            serp_limiter = RPSLimiter(settings.SERP_MAX_RPS)
+            sem_serp = asyncio.Semaphore(settings.SERP_CONCURRENCY)
+            sem_oa = asyncio.Semaphore(settings.OPENAI_CONCURRENCY)
 
         processed_count = [0]
+        session_serp, session_oa = self.clients.serp, self.clients.openai
+        # Row tasks inherit the binding, so spans and counters land in this job's summary
+        metrics_token = bind_job(self.job_metrics)
 
-        async with aiohttp.ClientSession(connector=connector_serp) as session_serp, \
-                aiohttp.ClientSession(connector=connector_oa) as session_oa:
-
-            tasks = []
-            for idx in pending_indices:
+        tasks = []
+        if settings.ENABLE_PIPELINE:
+            tasks.append(asyncio.create_task(self.run_pipeline(
+                records, session_serp, session_oa, serp_limiter, sem_serp, sem_oa, out, processed_count, total_count
+            )))
+        else:
+            for rec in records:
                 if self.openai_unhealthy.is_set():
                     break
-                row = out_df.loc[idx]
                 tasks.append(asyncio.create_task(self.process_row(
-                    idx, row, session_serp, session_oa, serp_limiter, sem_serp, sem_oa,
-                    out_df, company_col, context_cols, processed_count, total_count
+                    rec, session_serp, session_oa, serp_limiter, sem_serp, sem_oa, out, processed_count, total_count
                 )))
 
-            try:
-                for fut in asyncio.as_completed(tasks):
-                    await fut
-                    if self.openai_unhealthy.is_set():
-                        for t in tasks:
-                            if not t.done():
-                                t.cancel()
-                        break
-            except asyncio.CancelledError:
-                pass
-
-        await self.update_progress(total_count, total_count, "Enrichment complete!")
+        try:
+            pending = set(tasks)
+            while pending:
+                # Wake up periodically so rows finished before a pause/cancel are checkpointed right away
+                done, pending = await asyncio.wait(pending, timeout=1.0, return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    fut.result()
+                if (len(self._checkpoint_pending) >= settings.CHECKPOINT_EVERY
+                        or (self._checkpoint_pending and (self.control.paused or self.control.cancelled))):
+                    await self.flush_checkpoint(out_df, out)
+                if self.openai_unhealthy.is_set():
+                    for t in pending:
+                        t.cancel()
+                    break
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await self.flush_checkpoint(out_df, out)
+            unbind_job(metrics_token)
+            if self.scheduler is not None:
+                self.scheduler.unregister(self.job_key)
+
+        out.materialize(out_df)
+        if self.control.cancelled:
+            await self.update_progress(processed_count[0], total_count, "Enrichment cancelled")
+        else:
+            await self.update_progress(total_count, total_count, "Enrichment complete!")
         return out_df
@@ -0,0 +1,227 @@
+"""
+Result export writers (CSV, XLSX, Parquet, JSON Lines)
+"""
+import gzip
+import io
+import math
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from backend.config import settings
+
+
+# -------------------- Constants --------------------
+DEBUG_COLUMNS = ["URL_ambiguity", "URL_cand_count", "URL_reg_match",
+                 "URL_reg_ids_found", "URL_debug", "URL_found_domain"]
+
+EXPORT_FORMATS = {"csv": ".csv", "xlsx": ".xlsx", "parquet": ".parquet", "jsonl": ".jsonl"}
+COMPRESSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+# Formats that are already compressed containers or compress internally
+_NO_FILE_COMPRESSION = {"xlsx", "parquet"}
+
+
+# -------------------- Helpers --------------------
+def resolve_export_format(fmt: Optional[str], source_filename: str) -> str:
+    fmt = (fmt or settings.EXPORT_FORMAT or "auto").strip().lower()
+    if fmt == "auto":
+        return "csv" if source_filename.lower().endswith(".csv") else "xlsx"
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    return fmt
+
+
+def resolve_compression(compression: Optional[str], fmt: str) -> str:
+    compression = (compression or settings.EXPORT_COMPRESSION or "none").strip().lower()
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported compression: {compression}")
+    if compression == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            raise ValueError("zstd compression requires the 'zstandard' package")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet export requires the 'pyarrow' package")
+    return compression
+
+
+def export_filename(stem: str, fmt: str, compression: str) -> str:
+    suffix = EXPORT_FORMATS[fmt]
+    if fmt not in _NO_FILE_COMPRESSION:
+        suffix += COMPRESSIONS[compression]
+    return stem + suffix
+
+
+def _open_binary(path: Path, compression: str):
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=settings.EXPORT_GZIP_LEVEL)
+    if compression == "zstd":
+        import zstandard
+        raw = open(path, "wb")
+        return zstandard.ZstdCompressor(level=settings.EXPORT_ZSTD_LEVEL).stream_writer(raw, closefd=True)
+    return open(path, "wb")
+
+
+def _cell(v):
+    if v is None:
+        return None
+    if isinstance(v, float) and math.isnan(v):
+        return None
+    if v is pd.NaT or v is pd.NA:
+        return None
+    if isinstance(v, datetime) and v.tzinfo is not None:
+        # xlsx has no time zones; keep the wall-clock time
+        return v.replace(tzinfo=None)
+    return v
+
+
+# -------------------- Writers --------------------
+class _TextWriter:
+    """Streams chunks to a (possibly compressed) text file"""
+
+    def __init__(self, path: Path, compression: str):
+        self.path = path
+        self.raw = _open_binary(path, compression)
+        self.fh = io.TextIOWrapper(self.raw, encoding="utf-8", newline="")
+        self.first = True
+
+    def close(self):
+        self.fh.flush()
+        self.fh.close()
+
+
+class CSVWriter(_TextWriter):
+    def write_chunk(self, chunk: pd.DataFrame):
+        chunk.to_csv(self.fh, header=self.first, index=False)
+        self.first = False
+
+
+class JSONLWriter(_TextWriter):
+    def write_chunk(self, chunk: pd.DataFrame):
+        if chunk.empty:
+            return
+        txt = chunk.to_json(orient="records", lines=True, force_ascii=False)
+        if not txt.endswith("\n"):
+            txt += "\n"
+        self.fh.write(txt)
+        self.first = False
+
+
+class ParquetWriter:
+    def __init__(self, path: Path, compression: str):
+        self.path = path
+        self.codec = {"none": "none", "gzip": "gzip", "zstd": "zstd"}[compression]
+        self.schema = None
+        self.writer = None
+
+    @staticmethod
+    def _arrow_safe(chunk: pd.DataFrame) -> pd.DataFrame:
+        # Result columns mix "" and numbers; store object columns as strings
+        obj_cols = [c for c in chunk.columns if chunk[c].dtype == object]
+        if not obj_cols:
+            return chunk
+        return chunk.astype({c: "string" for c in obj_cols})
+
+    def write_chunk(self, chunk: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(self._arrow_safe(chunk), schema=self.schema, preserve_index=False)
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = pq.ParquetWriter(str(self.path), self.schema, compression=self.codec)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            pq.write_table(pa.table({}), str(self.path))
+            return
+        self.writer.close()
+
+
+class XLSXWriter:
+    """Row-streaming xlsx writer: xlsxwriter constant_memory, else openpyxl write_only"""
+
+    def __init__(self, path: Path, compression: str):
+        self.path = path
+        self.first = True
+        self.row = 0
+        try:
+            import xlsxwriter
+            self.wb = xlsxwriter.Workbook(str(path), {
+                "constant_memory": True, "nan_inf_to_errors": True,
+                "default_date_format": "yyyy-mm-dd hh:mm:ss", "strings_to_urls": False,
+            })
+            self.ws = self.wb.add_worksheet()
+            self.backend = "xlsxwriter"
+        except ImportError:
+            from openpyxl import Workbook
+            self.wb = Workbook(write_only=True)
+            self.ws = self.wb.create_sheet()
+            self.backend = "openpyxl"
+
+    def _append(self, values: list):
+        if self.backend == "xlsxwriter":
+            self.ws.write_row(self.row, 0, values)
+        else:
+            self.ws.append(values)
+        self.row += 1
+
+    def write_chunk(self, chunk: pd.DataFrame):
+        if self.first:
+            self._append([str(c) for c in chunk.columns])
+            self.first = False
+        for tup in chunk.itertuples(index=False, name=None):
+            self._append([_cell(v) for v in tup])
+
+    def close(self):
+        if self.backend == "xlsxwriter":
+            self.wb.close()
+        else:
+            self.wb.save(str(self.path))
+
+
+WRITERS = {"csv": CSVWriter, "jsonl": JSONLWriter, "parquet": ParquetWriter, "xlsx": XLSXWriter}
+
+
+# -------------------- Export --------------------
+def export_result(df: pd.DataFrame, results_dir: Path, stem: str, fmt: str, compression: str = "none",
+                  with_debug: bool = False, chunk_rows: int = None) -> Dict[str, str]:
+    """Write the public result (and optionally the debug variant) in a single pass over df"""
+    chunk_rows = max(1, int(chunk_rows or settings.EXPORT_CHUNK_ROWS))
+    public_cols: List[str] = [c for c in df.columns if c not in DEBUG_COLUMNS]
+
+    paths = {"result": results_dir / export_filename(stem, fmt, compression)}
+    if with_debug:
+        paths["debug"] = results_dir / export_filename(stem + "_debug", fmt, compression)
+
+    writers = {}
+    try:
+        for key, path in paths.items():
+            writers[key] = WRITERS[fmt](path, compression)
+        n = len(df)
+        for start in range(0, max(n, 1), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            writers["result"].write_chunk(chunk[public_cols])
+            if "debug" in writers:
+                writers["debug"].write_chunk(chunk)
+    finally:
+        for w in writers.values():
+            w.close()
+
+    return {k: str(p) for k, p in paths.items()}
+
+
+def append_checkpoint(path: Path, rows: pd.DataFrame):
+    """Append finished rows (public columns) to a job's partial CSV"""
+    public = rows[[c for c in rows.columns if c not in DEBUG_COLUMNS]]
+    write_header = not path.exists() or path.stat().st_size == 0
+    with open(path, "a", encoding="utf-8", newline="") as fh:
+        public.to_csv(fh, header=write_header, index=False)
@@ -0,0 +1,115 @@
+"""
+Hedged provider requests: fire a duplicate once a call outlives the recent p95 latency, keep the first good answer
+"""
+import asyncio
+import contextlib
+import threading
+from collections import deque
+from typing import AsyncContextManager, Awaitable, Callable, Dict, Optional
+
+from backend.config import settings
+from backend.metrics import count, HEDGED_REQUESTS
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies per tag"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.samples: Dict[str, deque] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, tag: str, seconds: float):
+        with self.lock:
+            q = self.samples.get(tag)
+            if q is None:
+                q = self.samples[tag] = deque(maxlen=self.window)
+            q.append(seconds)
+
+    def quantile(self, tag: str, q: float) -> Optional[float]:
+        with self.lock:
+            values = sorted(self.samples.get(tag) or ())
+        if len(values) < settings.HEDGE_MIN_SAMPLES:
+            return None
+        return values[min(len(values) - 1, int(q * (len(values) - 1)))]
+
+
+class Hedger:
+    def __init__(self):
+        self.latency = LatencyTracker(settings.HEDGE_WINDOW)
+        self.requests: Dict[str, int] = {}
+        self.hedges: Dict[str, int] = {}
+
+    def hedge_delay(self, tag: str) -> Optional[float]:
+        if not settings.HEDGE_ENABLED:
+            return None
+        q = self.latency.quantile(tag, settings.HEDGE_QUANTILE)
+        return None if q is None else max(q, settings.HEDGE_MIN_DELAY_SEC)
+
+    def _allow(self, tag: str) -> bool:
+        """Keep hedges under HEDGE_MAX_RATE of the tag's requests"""
+        return self.hedges.get(tag, 0) + 1 <= settings.HEDGE_MAX_RATE * self.requests.get(tag, 0)
+
+    @staticmethod
+    async def _gated(gate: Optional[Callable[[], AsyncContextManager]], call: Callable[[], Awaitable[tuple]],
+                     info: Optional[dict]):
+        if gate is None:
+            gate = contextlib.nullcontext
+        async with gate():
+            if info is not None:
+                info["hedged"] = True
+            return await call()
+
+    async def run(self, tag: str, call: Callable[[], Awaitable[tuple]],
+                  gate: Optional[Callable[[], AsyncContextManager]] = None, info: Optional[dict] = None) -> tuple:
+        """Await call() -> (status, payload), racing a second copy if the first is slower than the tag's p95.
+
+        The copy runs inside gate() (its own provider slot and rate-limiter token); info["hedged"] is set once
+        it is actually sent, so callers can bill both attempts.
+        """
+        self.requests[tag] = self.requests.get(tag, 0) + 1
+        delay = self.hedge_delay(tag)
+        primary = asyncio.ensure_future(call())
+        if delay is None:
+            return await primary
+        secondary = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+            if not self._allow(tag):
+                count(HEDGED_REQUESTS, tag=tag, outcome="capped")
+                return await primary
+            self.hedges[tag] = self.hedges.get(tag, 0) + 1
+            count(HEDGED_REQUESTS, tag=tag, outcome="fired")
+            secondary = asyncio.ensure_future(self._gated(gate, call, info))
+            pending = {primary, secondary}
+            result = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    if fut.exception() is not None:
+                        continue
+                    result = fut.result()
+                    if result[0] == 200:
+                        if fut is secondary:
+                            count(HEDGED_REQUESTS, tag=tag, outcome="won")
+                        return result
+            if result is None:
+                return primary.result()
+            return result
+        finally:
+            for fut in (primary, secondary):
+                if fut is not None and not fut.done():
+                    fut.cancel()
+
+    def snapshot(self) -> dict:
+        out = {}
+        for tag in sorted(self.latency.samples):
+            q = self.latency.quantile(tag, settings.HEDGE_QUANTILE)
+            out[tag] = {"p_hedge_ms": None if q is None else round(1000 * q, 1),
+                        "requests": self.requests.get(tag, 0), "hedges": self.hedges.get(tag, 0)}
+        return {"enabled": settings.HEDGE_ENABLED, "tags": out}
+
+
+hedger = Hedger()
@@ -0,0 +1,99 @@
+"""
+Incremental re-enrichment: row fingerprints and per-dataset result snapshots
+"""
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from backend.config import settings
+from backend.enrichment_engine import OUTPUT_COLUMNS, init_output, safe_json
+
+
+FINGERPRINT_COL = "_row_fingerprint"
+
+
+# -------------------- Helpers --------------------
+def dataset_key(dataset_id: Optional[str], filename: str) -> str:
+    raw = (dataset_id or Path(filename).stem or "dataset").strip()
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", raw)[:120] or "dataset"
+
+
+def snapshot_path(key: str) -> Path:
+    return settings.INCREMENTAL_DIR / f"{key}.csv"
+
+
+def row_fingerprints(df: pd.DataFrame, company_col: str, context_cols: List[str]) -> List[str]:
+    """Stable hash of each row's enrichment inputs (company + context columns)"""
+    cols = [company_col] + sorted(c for c in context_cols if c != company_col)
+    columns = [df[c].tolist() for c in cols]
+    out = []
+    for values in zip(*columns):
+        parts = [f"{c}={safe_json(v).lower()}" for c, v in zip(cols, values)]
+        out.append(hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest())
+    return out
+
+
+def _score(v) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return -1.0
+
+
+# -------------------- Snapshots --------------------
+def load_snapshot(key: str) -> Dict[str, dict]:
+    path = snapshot_path(key)
+    if not path.exists():
+        return {}
+    prev = pd.read_csv(path, dtype=str, keep_default_na=False)
+    cols = [c for c in OUTPUT_COLUMNS if c in prev.columns]
+    values = [prev[c].tolist() for c in cols]
+    return {fp: dict(zip(cols, row)) for fp, row in zip(prev[FINGERPRINT_COL].tolist(), zip(*values))}
+
+
+def save_snapshot(key: str, result_df: pd.DataFrame, fingerprints: List[str]):
+    path = snapshot_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    snap = result_df[[c for c in OUTPUT_COLUMNS if c in result_df.columns]].copy()
+    snap.insert(0, FINGERPRINT_COL, fingerprints)
+    snap = snap.drop_duplicates(subset=[FINGERPRINT_COL], keep="last")
+    tmp = path.with_suffix(".tmp")
+    snap.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def apply_previous_results(df: pd.DataFrame, fingerprints: List[str], previous: Dict[str, dict],
+                           recheck_below: int) -> dict:
+    """Prefill output columns for unchanged rows whose previous score is good enough.
+
+    Prefilled rows carry a URL, so enrich_dataframe skips them; everything else is re-enqueued.
+    """
+    init_output(df)
+    stats = {"reused": 0, "new_or_changed": 0, "low_confidence": 0}
+    reuse_pos, reuse_rows, recheck_pos = [], [], []
+    for pos, fp in enumerate(fingerprints):
+        prev = previous.get(fp)
+        if prev is None:
+            stats["new_or_changed"] += 1
+            continue
+        if not prev.get("URL") or _score(prev.get("URL_confidence_score")) < recheck_below:
+            # Clear any URL carried in the upload so the row is re-enriched
+            recheck_pos.append(pos)
+            stats["low_confidence"] += 1
+            continue
+        reuse_pos.append(pos)
+        reuse_rows.append(prev)
+        stats["reused"] += 1
+    if reuse_pos or recheck_pos:
+        for col in OUTPUT_COLUMNS:
+            df[col] = df[col].astype(object)
+            loc = df.columns.get_loc(col)
+            if reuse_pos:
+                df.iloc[reuse_pos, loc] = [r.get(col, "") for r in reuse_rows]
+            if recheck_pos:
+                df.iloc[recheck_pos, loc] = ""
+    return stats
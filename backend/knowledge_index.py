@@ -0,0 +1,185 @@
+"""
+Persistent company -> domain knowledge index (SQLite) built from confident past results
+"""
+import sqlite3
+import threading
+import time
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from backend.config import settings
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    name_key TEXT NOT NULL,
+    country TEXT NOT NULL DEFAULT '',
+    company TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    reg_match INTEGER NOT NULL DEFAULT 0,
+    provenance TEXT NOT NULL DEFAULT '',
+    hits INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (name_key, country)
+);
+CREATE TABLE IF NOT EXISTS tokens (
+    token TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    country TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (token, name_key, country)
+);
+"""
+
+
+def name_key(tokens: List[str]) -> str:
+    return " ".join(t for t in tokens if t)
+
+
+class KnowledgeIndex:
+    """Exact lookup on normalized name tokens + country, fuzzy fallback through a token inverted index.
+
+    Entries without a country match any country; a country-specific entry wins over a country-less one.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        self.pending_hits: Dict[Tuple[str, str], int] = {}
+        self.pending_count = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self.lock:
+            if self._conn is not None:
+                self._flush_hits(self._conn)
+                self._conn.close()
+                self._conn = None
+
+    def _flush_hits(self, db: sqlite3.Connection):
+        """Write buffered hit counts (caller holds the lock)"""
+        if not self.pending_hits:
+            return
+        hits, self.pending_hits, self.pending_count = self.pending_hits, {}, 0
+        with db:
+            db.executemany("UPDATE entries SET hits = hits + ? WHERE name_key = ? AND country = ?",
+                           [(n, key, country) for (key, country), n in hits.items()])
+
+    # -------------------- Writes --------------------
+    def upsert_many(self, entries: Iterable[dict], provenance: str = "") -> int:
+        """Insert or refresh entries (keys: tokens, country, company, domain, score, reg_match).
+
+        An existing entry is only replaced by one that is at least as strong (registration match first, then score).
+        """
+        now = time.time()
+        written = 0
+        with self.lock:
+            db = self._db()
+            self._flush_hits(db)
+            with db:
+                for e in entries:
+                    key = name_key(e["tokens"])
+                    if not key or not e.get("domain"):
+                        continue
+                    country = (e.get("country") or "").upper()
+                    cur = db.execute(
+                        """INSERT INTO entries (name_key, country, company, domain, score, reg_match, provenance,
+                                                updated_at)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                           ON CONFLICT (name_key, country) DO UPDATE SET
+                               company = excluded.company, domain = excluded.domain, score = excluded.score,
+                               reg_match = excluded.reg_match, provenance = excluded.provenance,
+                               updated_at = excluded.updated_at
+                           WHERE excluded.reg_match > entries.reg_match
+                              OR (excluded.reg_match = entries.reg_match AND excluded.score >= entries.score)""",
+                        (key, country, e.get("company", ""), e["domain"], int(e.get("score") or 0),
+                         1 if e.get("reg_match") else 0, provenance, now))
+                    if cur.rowcount:
+                        db.executemany("INSERT OR IGNORE INTO tokens (token, name_key, country) VALUES (?, ?, ?)",
+                                       [(t, key, country) for t in set(e["tokens"]) if t])
+                        written += 1
+        return written
+
+    # -------------------- Reads --------------------
+    def _row_to_dict(self, row: sqlite3.Row, match: str, similarity: float) -> dict:
+        return {"domain": row["domain"], "score": row["score"], "reg_match": bool(row["reg_match"]),
+                "provenance": row["provenance"], "company": row["company"], "match": match,
+                "similarity": round(similarity, 3)}
+
+    def lookup(self, tokens: List[str], country: str = "") -> Optional[dict]:
+        key = name_key(tokens)
+        if not key:
+            return None
+        country = (country or "").upper()
+        with self.lock:
+            db = self._db()
+            rows = db.execute("SELECT * FROM entries WHERE name_key = ? AND country IN (?, '') "
+                              "ORDER BY country DESC LIMIT 1", (key, country)).fetchall()
+            row, match, ratio = (rows[0], "exact", 1.0) if rows else self._fuzzy(db, tokens, key, country)
+            if row is None:
+                return None
+            hit_key = (row["name_key"], row["country"])
+            self.pending_hits[hit_key] = self.pending_hits.get(hit_key, 0) + 1
+            self.pending_count += 1
+            if self.pending_count >= settings.KNOWLEDGE_HIT_FLUSH_EVERY:
+                self._flush_hits(db)
+        return self._row_to_dict(row, match, ratio)
+
+    def _fuzzy(self, db: sqlite3.Connection, tokens: List[str], key: str, country: str):
+        uniq = sorted(set(tokens))
+        marks = ",".join("?" * len(uniq))
+        rows = db.execute(
+            f"""SELECT e.*, COUNT(*) AS shared FROM tokens t
+                JOIN entries e ON e.name_key = t.name_key AND e.country = t.country
+                WHERE t.token IN ({marks}) AND t.country IN (?, '')
+                GROUP BY e.name_key, e.country ORDER BY shared DESC LIMIT ?""",
+            (*uniq, country, settings.KNOWLEDGE_FUZZY_CANDIDATES)).fetchall()
+        best, best_ratio = None, 0.0
+        for row in rows:
+            ratio = SequenceMatcher(None, key, row["name_key"]).ratio()
+            if ratio > best_ratio or (ratio == best_ratio and best is not None and row["score"] > best["score"]):
+                best, best_ratio = row, ratio
+        if best is None or best_ratio < settings.KNOWLEDGE_FUZZY_MIN_RATIO:
+            return None, "", 0.0
+        return best, "fuzzy", best_ratio
+
+    def search(self, tokens: List[str], country: str = "", limit: int = 10) -> List[dict]:
+        """Entries whose every name token appears in tokens (e.g. a search query), most specific first"""
+        query = set(t for t in tokens if t)
+        if not query:
+            return []
+        country = (country or "").upper()
+        uniq = sorted(query)
+        marks = ",".join("?" * len(uniq))
+        with self.lock:
+            db = self._db()
+            rows = db.execute(
+                f"""SELECT e.*, COUNT(*) AS shared FROM tokens t
+                    JOIN entries e ON e.name_key = t.name_key AND e.country = t.country
+                    WHERE t.token IN ({marks}) AND t.country IN (?, '')
+                    GROUP BY e.name_key, e.country ORDER BY shared DESC LIMIT ?""",
+                (*uniq, country, settings.KNOWLEDGE_FUZZY_CANDIDATES)).fetchall()
+        hits = [r for r in rows if set(r["name_key"].split()) <= query]
+        hits.sort(key=lambda r: (-r["shared"], r["country"] == "", -r["score"]))
+        return [self._row_to_dict(r, "search", 1.0) for r in hits[:limit]]
+
+    def stats(self) -> dict:
+        with self.lock:
+            db = self._db()
+            self._flush_hits(db)
+            n, hits = db.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM entries").fetchone()
+        return {"entries": n, "hits": hits, "path": str(self.path)}
+
+
+knowledge_index = KnowledgeIndex(settings.KNOWLEDGE_INDEX_PATH)
@@ -0,0 +1,95 @@
+"""
+Synchronous single-company lookups backed by a warm, shared EnrichmentEngine and HTTP clients
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+import pandas as pd
+
+from backend.config import settings
+from backend.enrichment_engine import EnrichmentEngine, find_company_col, detect_context_columns, safe_json
+from backend.scheduler import provider_scheduler
+from backend.search_providers import search_router
+
+
+class BoundedCache(OrderedDict):
+    """LRU dict so long-lived lookup caches don't grow without bound"""
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = max(1, int(maxsize))
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+class LookupService:
+    def __init__(self):
+        self.engine = EnrichmentEngine(search=search_router)
+        self.engine.race_search = settings.SEARCH_RACE_LOOKUPS
+        self.engine.search_cache = BoundedCache(settings.LOOKUP_CACHE_SIZE)
+        self.engine.llm_cache = BoundedCache(settings.LOOKUP_CACHE_SIZE)
+        self.scheduler = provider_scheduler
+
+    async def lookup(self, company: str, context: Dict[str, object], timeout: float, index: int = 0) -> dict:
+        company = (company or "").strip()
+        if not company:
+            return {"company": company, "status": "invalid", "error": "Empty company name"}
+        clients = self.engine.clients
+        await clients.start()
+        ctx = {k: v for k, v in (context or {}).items() if safe_json(v)}
+        # Lookups draw from the same provider budgets as running jobs, with interactive weight
+        lanes = self.scheduler.register("lookup-api", "interactive")
+        started = time.monotonic()
+        try:
+            res = await asyncio.wait_for(
+                self.engine.resolve_company(index, company, ctx, clients.serp, clients.openai,
+                                            self.scheduler.serp_limiter(), lanes.serp, lanes.openai),
+                timeout=max(0.05, timeout))
+        except asyncio.TimeoutError:
+            return {"company": company, "status": "timeout",
+                    "elapsed_ms": int((time.monotonic() - started) * 1000)}
+        except RuntimeError as e:
+            # One failed call should not poison the shared engine
+            self.engine.openai_unhealthy.clear()
+            return {"company": company, "status": "error", "error": str(e)[:300],
+                    "elapsed_ms": int((time.monotonic() - started) * 1000)}
+        return {
+            "company": company,
+            "status": "ok",
+            "domain": res["domain"],
+            "score": res["score"] if res["score"] != "" else None,
+            "confidence": res["confidence"],
+            "reason": res["reason"],
+            "found_domain": res["found_domain"],
+            "reg_match": res["reg_match"],
+            "elapsed_ms": int((time.monotonic() - started) * 1000),
+        }
+
+    async def lookup_batch(self, rows: List[Dict[str, object]], timeout: float) -> List[dict]:
+        if not rows:
+            return []
+        sample = pd.DataFrame(rows[:50])
+        company_col = find_company_col(sample)
+        context_cols = [c for c in detect_context_columns(sample) if c != company_col]
+        deadline = time.monotonic() + timeout
+
+        async def one(i, row):
+            remaining = deadline - time.monotonic()
+            ctx = {c: row.get(c) for c in context_cols if c in row}
+            return await self.lookup(str(row.get(company_col) or ""), ctx, remaining, index=i)
+
+        return list(await asyncio.gather(*(one(i, r) for i, r in enumerate(rows))))
+
+
+lookup_service = LookupService()
@@ -3,19 +3,34 @@ import json
 import os
 import uuid
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 import pandas as pd
-from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
 from backend.config import settings
-from backend.enrichment_engine import EnrichmentEngine, find_company_col, detect_context_columns
+from backend.enrichment_engine import (EnrichmentEngine, JobControl, find_company_col, detect_context_columns,
+                                       learn_from_results)
+from backend.exporters import export_result, resolve_export_format, resolve_compression, append_checkpoint
+from backend.incremental import (dataset_key, row_fingerprints, load_snapshot, save_snapshot,
+                                 apply_previous_results)
+from backend.lookup import lookup_service
+from backend.clients import client_manager
+from backend.knowledge_index import knowledge_index
+from backend.metrics import render_prometheus
+from backend.usage import JobUsage, BUDGET_ACTIONS
+from backend.scheduler import provider_scheduler, auto_priority, PRIORITIES
+from backend.hedging import hedger
+from backend.search_providers import search_router
+from backend.crawl_policy import crawl_policy
+from backend.downloads import build_download_response, build_partial_response, remove_compressed_variants
 
 # Configure logging
 logging.basicConfig(
@@ -24,7 +39,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Domain Enrichment SaaS", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm, shared HTTP pools for every job, lookup and the crawler
+    await client_manager.start()
+    yield
+    await client_manager.close()
+    knowledge_index.close()
+
+
+app = FastAPI(title="Domain Enrichment SaaS", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -54,6 +79,30 @@ class ColumnMapping(BaseModel):
 class EnrichmentRequest(BaseModel):
     job_id: str
     column_mappings: List[ColumnMapping]
+    output_format: Optional[str] = None  # csv, xlsx, parquet, jsonl (default: same as upload)
+    compression: Optional[str] = None  # none, gzip, zstd
+    include_debug: Optional[bool] = None
+    incremental: bool = False  # only re-enrich new/changed/low-confidence rows
+    dataset_id: Optional[str] = None  # defaults to the uploaded file name; setting it keeps a snapshot for later runs
+    recheck_below: Optional[int] = None  # re-run rows whose previous score is below this
+    budget_usd: Optional[float] = None  # optional spend cap for this job
+    budget_action: str = "degrade"  # degrade (fewer queries, no legal crawl) or pause
+    priority: Optional[str] = None  # interactive, normal or batch (default: from the row count)
+
+
+class ResumeRequest(BaseModel):
+    budget_usd: Optional[float] = None  # new spend cap for a job paused on budget
+
+
+class LookupRequest(BaseModel):
+    company: str
+    context: Dict[str, Any] = {}
+    timeout: Optional[float] = None  # latency budget in seconds
+
+
+class LookupBatchRequest(BaseModel):
+    rows: List[Dict[str, Any]]
+    timeout: Optional[float] = None
 
 
 class JobStatus(BaseModel):
@@ -66,6 +115,12 @@ class JobStatus(BaseModel):
     error: Optional[str] = None
 
 
+def _lookup_timeout(timeout: Optional[float]) -> float:
+    if timeout is None:
+        return settings.LOOKUP_TIMEOUT_SEC
+    return max(0.05, min(float(timeout), settings.LOOKUP_MAX_TIMEOUT_SEC))
+
+
 @app.get("/")
 async def root():
     return FileResponse(str(frontend_path / "index.html"))
@@ -192,10 +247,37 @@ async def start_enrichment(request: EnrichmentRequest):
         logger.warning(f"⚠️  Job already completed: {job_id}")
         raise HTTPException(status_code=400, detail="Job already completed")
 
+    try:
+        output_format = resolve_export_format(request.output_format, job["filename"])
+        compression = resolve_compression(request.compression, output_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if request.budget_action not in BUDGET_ACTIONS:
+        raise HTTPException(status_code=400, detail=f"budget_action must be one of {list(BUDGET_ACTIONS)}")
+
+    if request.priority is not None and request.priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {list(PRIORITIES)}")
+
     # Update job status
     job["status"] = "processing"
     job["message"] = "Starting enrichment..."
     job["column_mappings"] = [m.dict() for m in request.column_mappings]
+    job["export"] = {
+        "format": output_format,
+        "compression": compression,
+        "include_debug": settings.EXPORT_DEBUG_VARIANT if request.include_debug is None else request.include_debug
+    }
+    job["budget"] = {"budget_usd": request.budget_usd, "budget_action": request.budget_action}
+    job["priority"] = request.priority
+    job["control"] = JobControl()
+    job["incremental"] = {
+        "enabled": request.incremental,
+        "dataset": dataset_key(request.dataset_id, job["filename"]),
+        # One-off uploads leave no snapshot behind; a first incremental run or a named dataset starts one
+        "snapshot": request.incremental or bool(request.dataset_id),
+        "recheck_below": settings.INCREMENTAL_RECHECK_BELOW if request.recheck_below is None else request.recheck_below
+    }
     logger.info(f"✅ Job status updated to 'processing'")
 
     # Start enrichment in background
@@ -208,6 +290,7 @@ async def start_enrichment(request: EnrichmentRequest):
 async def process_enrichment(job_id: str):
     """Background task to process enrichment"""
     job = jobs[job_id]
+    control = job["control"]
 
     try:
         # Load file
@@ -223,6 +306,31 @@ async def process_enrichment(job_id: str):
 
         job["total"] = len(df)
 
+        # Incremental mode: reuse previous results for unchanged, confident rows
+        loop = asyncio.get_running_loop()
+        incremental = job.get("incremental") or {}
+        fingerprints = None
+        try:
+            company_col = find_company_col(df)
+            fingerprints = row_fingerprints(df, company_col, detect_context_columns(df))
+        except ValueError:
+            pass
+        if incremental.get("enabled") and fingerprints is not None:
+            previous = await loop.run_in_executor(None, load_snapshot, incremental["dataset"])
+            stats = apply_previous_results(df, fingerprints, previous, incremental["recheck_below"])
+            incremental["stats"] = stats
+            logger.info(f"♻️  Incremental job {job_id}: {stats}")
+
+        # Checkpoint file for partial downloads (append-only CSV of finished rows)
+        partial_path = settings.RESULTS_DIR / f"{job_id}_partial.csv"
+        if partial_path.exists():
+            os.remove(partial_path)
+        job["partial_file"] = str(partial_path)
+
+        async def checkpoint_callback(rows: pd.DataFrame):
+            await loop.run_in_executor(None, append_checkpoint, partial_path, rows)
+            job["checkpointed_at"] = datetime.now().isoformat()
+
         # Progress callback
         async def progress_callback(current: int, total: int, message: str):
             job["progress"] = current
@@ -244,38 +352,69 @@ async def process_enrichment(job_id: str):
                     pass
 
         # Create enrichment engine
-        engine = EnrichmentEngine(progress_callback=progress_callback)
+        budget = job.get("budget") or {}
+        usage = JobUsage(budget.get("budget_usd"), budget.get("budget_action") or "degrade")
+        job["usage"] = usage
+        # Provider budgets are shared with every other running job and the lookup API
+        pending_rows = len(df) - (incremental.get("stats") or {}).get("reused", 0)
+        job["priority"] = job.get("priority") or auto_priority(pending_rows)
+        engine = EnrichmentEngine(progress_callback=progress_callback, checkpoint_callback=checkpoint_callback,
+                                  usage=usage, scheduler=provider_scheduler, job_key=job_id,
+                                  priority=job["priority"], control=control, search=search_router)
+        job["metrics"] = engine.job_metrics
 
         # Run enrichment
         result_df = await engine.enrich_dataframe(df)
 
-        # Clean up result (remove debug columns for final export)
-        export_df = result_df.copy()
-        cols_to_drop = ["URL_ambiguity", "URL_cand_count", "URL_reg_match",
-                        "URL_reg_ids_found", "URL_debug", "URL_found_domain"]
-        export_df = export_df.drop(columns=[c for c in cols_to_drop if c in export_df.columns], errors="ignore")
+        if job.get("deleted"):
+            # Cancelled by DELETE: the job and its files are already gone
+            if partial_path.exists():
+                os.remove(partial_path)
+            logger.info(f"🗑️  Deleted job {job_id} stopped")
+            return
 
-        # Save result
+        # Remember this run's results for the next incremental refresh of the dataset
+        if fingerprints is not None and incremental.get("snapshot") and incremental.get("dataset"):
+            await loop.run_in_executor(None, save_snapshot, incremental["dataset"], result_df, fingerprints)
+
+        # Feed confident results to the local knowledge index so recurring companies skip SERP/LLM
+        try:
+            learned = await loop.run_in_executor(None, learn_from_results, result_df, f"job:{job_id}")
+            job["knowledge_learned"] = learned
+        except Exception as e:
+            logger.warning(f"⚠️  Knowledge index update failed for job {job_id}: {e}")
+
+        # Save result (debug columns only go to the optional debug variant)
+        export = job.get("export") or {"format": resolve_export_format(None, job["filename"]),
+                                        "compression": "none", "include_debug": False}
         result_filename = f"{job_id}_enriched_{Path(job['filename']).stem}"
-        if job['filename'].endswith('.csv'):
-            result_path = settings.RESULTS_DIR / f"{result_filename}.csv"
-            export_df.to_csv(result_path, index=False)
+        written = await loop.run_in_executor(
+            None, lambda: export_result(result_df, settings.RESULTS_DIR, result_filename,
+                                        export["format"], export["compression"], export["include_debug"])
+        )
+
+        if control.cancelled:
+            job["status"] = "cancelled"
+            job["message"] = "Enrichment cancelled — partial results saved"
         else:
-            result_path = settings.RESULTS_DIR / f"{result_filename}.xlsx"
-            export_df.to_excel(result_path, index=False)
-
-        job["status"] = "completed"
-        job["message"] = "Enrichment completed successfully"
-        job["result_file"] = str(result_path)
+            job["status"] = "completed"
+            job["message"] = "Enrichment completed successfully"
+            # The full result supersedes the checkpoint file
+            if partial_path.exists():
+                remove_compressed_variants(partial_path)
+                os.remove(partial_path)
+            job["partial_file"] = None
+        job["result_file"] = written["result"]
+        job["debug_result_file"] = written.get("debug")
         job["completed_at"] = datetime.now().isoformat()
 
         # Send completion via WebSocket
         if job_id in websocket_connections:
             try:
                 await websocket_connections[job_id].send_json({
-                    "type": "completed",
+                    "type": job["status"],
                     "job_id": job_id,
-                    "message": "Enrichment completed successfully",
+                    "message": job["message"],
                     "download_url": f"/api/download/{job_id}"
                 })
             except Exception:
@@ -298,6 +437,112 @@ async def process_enrichment(job_id: str):
                 pass
 
 
+@app.post("/api/lookup")
+async def lookup_company(request: LookupRequest):
+    """Resolve a single company's domain inline (no file job)"""
+    result = await lookup_service.lookup(request.company, request.context, _lookup_timeout(request.timeout))
+    if result["status"] == "invalid":
+        raise HTTPException(status_code=400, detail=result["error"])
+    if result["status"] == "timeout":
+        raise HTTPException(status_code=504, detail=f"Lookup exceeded {_lookup_timeout(request.timeout)}s budget")
+    if result["status"] == "error":
+        raise HTTPException(status_code=502, detail=result["error"])
+    return result
+
+
+@app.post("/api/lookup/batch")
+async def lookup_companies(request: LookupBatchRequest):
+    """Resolve a small batch of JSON rows inline; each result carries its own status"""
+    if len(request.rows) > settings.LOOKUP_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"Too many rows (max {settings.LOOKUP_MAX_BATCH})")
+    try:
+        results = await lookup_service.lookup_batch(request.rows, _lookup_timeout(request.timeout))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"results": results}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics (stage latencies, cache hits, retries, HTTP statuses, tokens)"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/scheduler")
+async def scheduler_state():
+    """Provider slots in use and waiting, per job, plus hedging thresholds, search provider cooldowns and crawler
+    host caches"""
+    return {**provider_scheduler.snapshot(), "hedging": hedger.snapshot(), "search": search_router.snapshot(),
+            "crawler": crawl_policy.snapshot()}
+
+
+@app.get("/api/knowledge/stats")
+async def knowledge_stats():
+    """Size and hit count of the local company -> domain index"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, knowledge_index.stats)
+
+
+def job_status(job: dict) -> tuple:
+    """(status, message), reporting a running job that is paused as 'paused'"""
+    control = job.get("control")
+    if job["status"] == "processing" and control is not None:
+        if control.cancelled:
+            return "cancelling", "Cancelling — waiting for in-flight calls to finish"
+        if control.paused:
+            if control.pause_reason == "budget":
+                usage = job.get("usage")
+                budget = usage.budget_usd if usage else None
+                return "paused", f"Budget of ${budget} reached — job paused, resume with a higher budget"
+            return "paused", "Paused — resume to continue"
+    return job["status"], job["message"]
+
+
+def running_job(job_id: str) -> dict:
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job = jobs[job_id]
+    if job["status"] != "processing" or job.get("control") is None:
+        raise HTTPException(status_code=400, detail=f"Job is not running (status: {job['status']})")
+    return job
+
+
+@app.post("/api/jobs/{job_id}/pause")
+async def pause_job(job_id: str):
+    """Stop issuing provider calls; in-flight calls finish and their rows are checkpointed"""
+    job = running_job(job_id)
+    job["control"].pause("user")
+    logger.info(f"⏸️  Job paused: {job_id}")
+    status, message = job_status(job)
+    return {"job_id": job_id, "status": status, "message": message}
+
+
+@app.post("/api/jobs/{job_id}/resume")
+async def resume_job(job_id: str, request: Optional[ResumeRequest] = None):
+    """Resume a paused job (optionally with a new budget when it was paused on budget)"""
+    job = running_job(job_id)
+    control = job["control"]
+    if request is not None and "budget_usd" in request.model_fields_set and job.get("usage"):
+        job["usage"].raise_budget(request.budget_usd)
+    elif control.pause_reason == "budget":
+        raise HTTPException(status_code=400, detail="Job paused on budget — resume with a higher budget_usd")
+    control.resume()
+    job["message"] = "Resuming enrichment..."
+    logger.info(f"▶️  Job resumed: {job_id}")
+    status, message = job_status(job)
+    return {"job_id": job_id, "status": status, "message": message}
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a running job; rows finished so far are exported as the result"""
+    job = running_job(job_id)
+    job["control"].cancel()
+    logger.info(f"⏹️  Job cancelled: {job_id}")
+    status, message = job_status(job)
+    return {"job_id": job_id, "status": status, "message": message}
+
+
 @app.get("/api/status/{job_id}")
 async def get_job_status(job_id: str):
     """Get job status"""
@@ -306,39 +551,62 @@ async def get_job_status(job_id: str):
 
     job = jobs[job_id]
     percentage = int((job["progress"] / max(1, job["total"])) * 100) if job["total"] > 0 else 0
+    status, message = job_status(job)
 
     return {
         "job_id": job_id,
-        "status": job["status"],
+        "status": status,
         "progress": job["progress"],
         "total": job["total"],
         "percentage": percentage,
-        "message": job["message"],
+        "message": message,
         "result_file": job.get("result_file"),
+        "debug_result_file": job.get("debug_result_file"),
+        "incremental": job.get("incremental"),
+        "metrics": job["metrics"].summary() if job.get("metrics") else None,
+        "usage": job["usage"].summary() if job.get("usage") else None,
+        "knowledge_learned": job.get("knowledge_learned"),
+        "priority": job.get("priority"),
         "error": job.get("error")
     }
 
 
 @app.get("/api/download/{job_id}")
-async def download_result(job_id: str):
-    """Download enriched file"""
+async def download_result(request: Request, job_id: str, variant: str = "result"):
+    """Download enriched file (variant=debug for the file with debug columns)"""
     if job_id not in jobs:
         raise HTTPException(status_code=404, detail="Job not found")
 
     job = jobs[job_id]
 
-    if job["status"] != "completed":
+    if job["status"] not in ("completed", "cancelled"):
         raise HTTPException(status_code=400, detail="Job not completed yet")
 
-    if not job.get("result_file") or not Path(job["result_file"]).exists():
+    file_key = "debug_result_file" if variant == "debug" else "result_file"
+    if not job.get(file_key) or not Path(job[file_key]).exists():
         raise HTTPException(status_code=404, detail="Result file not found")
 
-    result_path = Path(job["result_file"])
-    return FileResponse(
-        path=result_path,
-        filename=result_path.name,
-        media_type='application/octet-stream'
-    )
+    result_path = Path(job[file_key])
+    return await build_download_response(request, result_path, result_path.name)
+
+
+@app.get("/api/download/{job_id}/partial")
+async def download_partial_result(request: Request, job_id: str):
+    """Download rows enriched so far (CSV) while the job is still running"""
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    job = jobs[job_id]
+
+    if job["status"] in ("completed", "cancelled") and job.get("result_file") and Path(job["result_file"]).exists():
+        result_path = Path(job["result_file"])
+        return await build_download_response(request, result_path, result_path.name)
+
+    if not job.get("partial_file") or not Path(job["partial_file"]).exists():
+        raise HTTPException(status_code=404, detail="No checkpointed results yet")
+
+    partial_path = Path(job["partial_file"])
+    return build_partial_response(request, partial_path, partial_path.name)
 
 
 @app.websocket("/ws/{job_id}")
@@ -369,12 +637,19 @@ async def delete_job(job_id: str):
 
     job = jobs[job_id]
 
+    # Stop a running job first so it stops spending; it notices the deletion and skips its export
+    if job.get("control") is not None and job["status"] == "processing":
+        job["deleted"] = True
+        job["control"].cancel()
+
     # Delete files
     try:
         if job.get("file_path") and Path(job["file_path"]).exists():
             os.remove(job["file_path"])
-        if job.get("result_file") and Path(job["result_file"]).exists():
-            os.remove(job["result_file"])
+        for key in ("result_file", "debug_result_file", "partial_file"):
+            if job.get(key) and Path(job[key]).exists():
+                remove_compressed_variants(Path(job[key]))
+                os.remove(job[key])
     except Exception:
         pass
 
@@ -391,9 +666,9 @@ async def list_jobs():
         {
             "job_id": job_id,
             "filename": job["filename"],
-            "status": job["status"],
+            "status": job_status(job)[0],
             "uploaded_at": job["uploaded_at"],
-            "message": job["message"]
+            "message": job_status(job)[1]
         }
         for job_id, job in jobs.items()
     ]
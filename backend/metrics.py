@@ -0,0 +1,181 @@
+"""
+Lightweight metrics: Prometheus text exposition plus per-job stage summaries
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _fmt_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{k}="{str(v)}"' for k, v in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+# -------------------- Metric types --------------------
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, n: float = 1, **labels):
+        key = tuple(str(labels.get(k, "")) for k in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + n
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, v in sorted(self.values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {v}")
+        return "\n".join(lines)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(k, "")) for k in self.labelnames)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, state in sorted(self.values.items()):
+                for i, b in enumerate(self.buckets):
+                    le = 'le="%s"' % b
+                    lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {state[i]}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {state[-1]}")
+                lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {state[-2]}")
+                lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {state[-1]}")
+        return "\n".join(lines)
+
+
+# -------------------- Registry --------------------
+STAGE_SECONDS = Histogram("enrichment_stage_seconds", "Latency of enrichment stages", ("stage",))
+CACHE_LOOKUPS = Counter("enrichment_cache_lookups_total", "Cache lookups by cache and result", ("cache", "result"))
+HTTP_RESPONSES = Counter("enrichment_http_responses_total", "Provider HTTP responses by tag and status",
+                         ("tag", "status"))
+HTTP_RETRIES = Counter("enrichment_http_retries_total", "Retried provider requests by tag", ("tag",))
+OPENAI_TOKENS = Counter("enrichment_openai_tokens_total", "OpenAI tokens used", ("kind",))
+ROWS_PROCESSED = Counter("enrichment_rows_total", "Rows processed by outcome", ("outcome",))
+PRERESOLVED = Counter("enrichment_preresolved_total", "Rows resolved without SERP/LLM by source", ("source",))
+HEURISTIC_DECISIONS = Counter("enrichment_heuristic_decisions_total", "Local pre-ranking decisions by outcome",
+                              ("outcome",))
+HEURISTIC_AUDIT = Counter("enrichment_heuristic_audit_total", "Audited heuristic decisions by LLM agreement",
+                          ("result",))
+HEDGED_REQUESTS = Counter("enrichment_hedged_requests_total", "Hedged provider requests by tag and outcome",
+                          ("tag", "outcome"))
+DEADLINES = Counter("enrichment_deadlines_total", "Row/stage deadline expirations by stage", ("stage",))
+LLM_PARSE = Counter("enrichment_llm_parse_total", "OpenAI choice answers by output mode and validation result",
+                    ("mode", "result"))
+MODEL_CASCADE = Counter("enrichment_model_cascade_total",
+                        "Fast-tier LLM answers kept or escalated to the main model, by reason", ("outcome",))
+SEARCH_PROVIDER_CALLS = Counter("enrichment_search_provider_calls_total", "Search provider calls by outcome",
+                                ("provider", "outcome"))
+CRAWL_REQUESTS = Counter("enrichment_crawl_requests_total", "Legal-page crawler requests by outcome", ("outcome",))
+
+REGISTRY = [STAGE_SECONDS, CACHE_LOOKUPS, HTTP_RESPONSES, HTTP_RETRIES, OPENAI_TOKENS, ROWS_PROCESSED, PRERESOLVED,
+            HEURISTIC_DECISIONS, HEURISTIC_AUDIT, HEDGED_REQUESTS, DEADLINES,
+            LLM_PARSE, MODEL_CASCADE, SEARCH_PROVIDER_CALLS, CRAWL_REQUESTS]
+
+
+def render_prometheus() -> str:
+    return "\n".join(m.render() for m in REGISTRY) + "\n"
+
+
+# -------------------- Per-job summary --------------------
+class JobMetrics:
+    """Stage timings and counters for one job, exposed in /api/status"""
+
+    def __init__(self):
+        self.stages: Dict[str, list] = {}  # stage -> [count, total_sec, max_sec]
+        self.counters: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self.lock:
+            st = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            st[0] += 1
+            st[1] += seconds
+            st[2] = max(st[2], seconds)
+
+    def inc(self, key: str, n: float = 1):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def summary(self) -> dict:
+        with self.lock:
+            stages = {
+                name: {"count": c, "total_sec": round(t, 3), "avg_ms": round(1000 * t / max(1, c), 1),
+                       "max_ms": round(1000 * m, 1)}
+                for name, (c, t, m) in self.stages.items()
+            }
+            return {"stages": stages, "counters": dict(self.counters)}
+
+
+_current_job: ContextVar[Optional[JobMetrics]] = ContextVar("current_job_metrics", default=None)
+
+
+def bind_job(job_metrics: Optional[JobMetrics]):
+    """Attach job_metrics to the current context (inherited by tasks created afterwards)"""
+    return _current_job.set(job_metrics)
+
+
+def unbind_job(token):
+    _current_job.reset(token)
+
+
+def current_job() -> Optional[JobMetrics]:
+    return _current_job.get()
+
+
+def observe(stage: str, seconds: float):
+    """Record a stage duration measured by the caller (e.g. time spent in a queue)"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    jm = _current_job.get()
+    if jm is not None:
+        jm.observe(stage, seconds)
+
+
+@contextmanager
+def span(stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - t0)
+
+
+def count(counter: Counter, n: float = 1, **labels):
+    """Increment a global counter and mirror it into the current job's summary"""
+    counter.inc(n, **labels)
+    jm = _current_job.get()
+    if jm is not None:
+        key = counter.name.replace("enrichment_", "").replace("_total", "")
+        suffix = ".".join(str(labels[k]) for k in counter.labelnames if k in labels)
+        jm.inc(f"{key}.{suffix}" if suffix else key, n)
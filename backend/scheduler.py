@@ -0,0 +1,205 @@
+"""
+Process-wide provider scheduler: one SERP rate limit and one pool of SERP/OpenAI slots shared by all jobs,
+handed out by weighted fair queuing
+"""
+import asyncio
+from typing import Dict, Optional
+
+from backend.config import settings
+from backend.enrichment_engine import RPSLimiter
+
+
+PRIORITIES = ("interactive", "normal", "batch")
+
+
+def priority_weight(priority: str) -> float:
+    return {
+        "interactive": settings.SCHED_WEIGHT_INTERACTIVE,
+        "normal": settings.SCHED_WEIGHT_NORMAL,
+        "batch": settings.SCHED_WEIGHT_BATCH,
+    }.get(priority, settings.SCHED_WEIGHT_NORMAL)
+
+
+def auto_priority(rows: int) -> str:
+    """Small uploads are interactive, huge ones batch"""
+    if rows <= settings.SCHED_INTERACTIVE_MAX_ROWS:
+        return "interactive"
+    if rows >= settings.SCHED_BATCH_MIN_ROWS:
+        return "batch"
+    return "normal"
+
+
+class _Share:
+    __slots__ = ("weight", "vtime", "in_use", "waiters", "granted", "closing")
+
+    def __init__(self, weight: float):
+        self.weight = max(0.01, float(weight))
+        self.vtime = 0.0
+        self.in_use = 0
+        self.waiters = []
+        self.granted = 0
+        self.closing = False  # unregistered while slots were still held or awaited
+
+
+class FairLane:
+    """Concurrency slots of one provider, granted to the waiting job with the smallest virtual time.
+
+    Each grant advances the job's virtual time by 1/weight, so busy jobs share slots in proportion to their
+    weights and a job that was idle re-enters at the current virtual time instead of with banked credit.
+    """
+
+    def __init__(self, name: str, capacity_setting: str):
+        self.name = name
+        self.capacity_setting = capacity_setting
+        self.in_use = 0
+        self.shares: Dict[str, _Share] = {}
+
+    @property
+    def capacity(self) -> int:
+        return max(1, int(getattr(settings, self.capacity_setting)))
+
+    def register(self, key: str, weight: float):
+        share = self.shares.get(key)
+        if share is None:
+            self.shares[key] = _Share(weight)
+        else:
+            share.weight = max(0.01, float(weight))
+            share.closing = False
+
+    def unregister(self, key: str):
+        share = self.shares.get(key)
+        if share is None:
+            return
+        # Outstanding slots are released by their holders; the share is dropped after the last one
+        share.closing = True
+        self._drop_if_closed(key, share)
+
+    def _drop_if_closed(self, key: str, share: _Share):
+        if share.closing and not share.in_use and not share.waiters and self.shares.get(key) is share:
+            del self.shares[key]
+
+    def _active_vtime(self) -> float:
+        active = [s.vtime for s in self.shares.values() if s.in_use or s.waiters]
+        return min(active) if active else 0.0
+
+    def _dispatch(self):
+        while self.in_use < self.capacity:
+            waiting = [(s.vtime, -s.weight, k) for k, s in self.shares.items() if s.waiters]
+            if not waiting:
+                return
+            _, _, key = min(waiting)
+            share = self.shares[key]
+            fut = share.waiters.pop(0)
+            if fut.done():
+                continue
+            share.vtime += 1.0 / share.weight
+            share.in_use += 1
+            share.granted += 1
+            self.in_use += 1
+            fut.set_result(None)
+
+    async def acquire(self, key: str):
+        share = self.shares.get(key)
+        if share is None:
+            # A straggler task of a job already unregistered: serve it at normal weight, then forget the job again
+            share = self.shares[key] = _Share(priority_weight("normal"))
+            share.closing = True
+        if not share.in_use and not share.waiters:
+            share.vtime = max(share.vtime, self._active_vtime())
+        fut = asyncio.get_running_loop().create_future()
+        share.waiters.append(fut)
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(key)
+            elif fut in share.waiters:
+                share.waiters.remove(fut)
+                self._drop_if_closed(key, share)
+            raise
+
+    def release(self, key: str):
+        share = self.shares.get(key)
+        if share is not None:
+            share.in_use -= 1
+            self._drop_if_closed(key, share)
+        self.in_use -= 1
+        self._dispatch()
+
+    def reset(self):
+        self.in_use = 0
+        for key, share in list(self.shares.items()):
+            share.in_use = 0
+            share.waiters = []
+            self._drop_if_closed(key, share)
+
+    def snapshot(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "jobs": {k: {"weight": s.weight, "in_use": s.in_use, "waiting": len(s.waiters), "granted": s.granted,
+                         "closing": s.closing} for k, s in self.shares.items()},
+        }
+
+
+class JobLane:
+    """Semaphore-like handle (async with) on a FairLane for one job"""
+
+    def __init__(self, lane: FairLane, key: str):
+        self.lane = lane
+        self.key = key
+
+    async def __aenter__(self):
+        await self.lane.acquire(self.key)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.lane.release(self.key)
+
+
+class JobLanes:
+    def __init__(self, serp: JobLane, openai: JobLane):
+        self.serp = serp
+        self.openai = openai
+
+
+class ProviderScheduler:
+    def __init__(self):
+        self.serp = FairLane("serp", "SERP_CONCURRENCY")
+        self.openai = FairLane("openai", "OPENAI_CONCURRENCY")
+        self._serp_limiter: Optional[RPSLimiter] = None
+        self._loop = None
+
+    def _check_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Futures and locks from a previous event loop cannot be awaited here
+            self._loop = loop
+            self._serp_limiter = None
+            self.serp.reset()
+            self.openai.reset()
+
+    def register(self, key: str, priority: str = "normal") -> JobLanes:
+        self._check_loop()
+        weight = priority_weight(priority)
+        self.serp.register(key, weight)
+        self.openai.register(key, weight)
+        return JobLanes(JobLane(self.serp, key), JobLane(self.openai, key))
+
+    def unregister(self, key: str):
+        self.serp.unregister(key)
+        self.openai.unregister(key)
+
+    def serp_limiter(self) -> RPSLimiter:
+        """The single SERP_MAX_RPS limiter shared by every job and lookup"""
+        self._check_loop()
+        if self._serp_limiter is None:
+            self._serp_limiter = RPSLimiter(settings.SERP_MAX_RPS)
+        return self._serp_limiter
+
+    def snapshot(self) -> dict:
+        return {"serp": self.serp.snapshot(), "openai": self.openai.snapshot()}
+
+
+provider_scheduler = ProviderScheduler()
@@ -0,0 +1,191 @@
+"""
+Pluggable web-search providers (Serper, Serper-compatible HTTP endpoints, the local knowledge index) behind a
+weighted router with failover on throttling and optional racing
+"""
+import asyncio
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from backend.config import settings
+from backend.enrichment_engine import (RPSLimiter, search_request, should_retry, name_tokens, country_code)
+from backend.knowledge_index import KnowledgeIndex, knowledge_index
+from backend.metrics import count, SEARCH_PROVIDER_CALLS
+
+
+# Provider outcomes: "ok" (answer, possibly empty), "miss" (nothing known, ask the next provider),
+# "throttled" (rate-limited or unavailable, cooled down) and "error"
+class SearchProvider(ABC):
+    name = ""
+    billed = True  # counts as a paid SERP query in JobUsage
+
+    def __init__(self, weight: float = 1.0):
+        self.weight = max(0.0, float(weight))
+
+    @abstractmethod
+    async def search(self, session, limiter: RPSLimiter, query: str, ctx: dict, num: int,
+                     max_retries: int = None) -> Tuple[str, list]:
+        """(outcome, raw results) for one query"""
+
+
+class HTTPSearchProvider(SearchProvider):
+    """Serper or any endpoint taking Serper's request body and returning a list of {link, title, snippet}"""
+
+    def __init__(self, name: str, url: str, api_key: str = "", key_header: str = "X-API-KEY",
+                 results_key: str = "organic", weight: float = 1.0):
+        super().__init__(weight)
+        self.name = name
+        self.url = url
+        self.api_key = api_key
+        self.key_header = key_header
+        self.results_key = results_key
+
+    def target(self) -> Tuple[str, str]:
+        return self.url, self.api_key
+
+    async def search(self, session, limiter, query, ctx, num, max_retries=None):
+        url, api_key = self.target()
+        headers = {"Content-Type": "application/json"}
+        if api_key:
+            headers[self.key_header] = api_key
+        status, results = await search_request(session, limiter, url, headers, query, ctx, num,
+                                               results_key=self.results_key, tag=f"{self.name}-search",
+                                               max_retries=max_retries)
+        if status == 200:
+            return "ok", results
+        if status is None or should_retry(status):
+            return "throttled", []
+        return "error", []
+
+
+class SerperProvider(HTTPSearchProvider):
+    """Serper with its endpoint and key read from settings at call time"""
+
+    def __init__(self, weight: float = 1.0):
+        super().__init__("serper", "", weight=weight)
+
+    def target(self) -> Tuple[str, str]:
+        return settings.SERPER_SEARCH_URL, settings.SERPER_API_KEY
+
+
+class LocalIndexProvider(SearchProvider):
+    """Known domains from the knowledge index whose company name is contained in the query (no HTTP, not billed)"""
+    name = "local"
+    billed = False
+
+    def __init__(self, index: KnowledgeIndex = None, weight: float = 1.0):
+        super().__init__(weight)
+        self.index = index or knowledge_index
+
+    async def search(self, session, limiter, query, ctx, num, max_retries=None):
+        # SQLite query in a worker thread, off the event loop
+        loop = asyncio.get_running_loop()
+        hits = await loop.run_in_executor(None, self.index.search, name_tokens(query), country_code(ctx), num)
+        if not hits:
+            return "miss", []
+        return "ok", [{"link": f"https://{h['domain']}/", "title": h["company"], "snippet": "local index"}
+                      for h in hits]
+
+
+class SearchRouter:
+    def __init__(self, providers: List[SearchProvider]):
+        if not providers:
+            raise ValueError("At least one search provider is required")
+        self.providers = providers
+        self.cooldown_until: Dict[str, float] = {}
+
+    def cooling(self, provider: SearchProvider) -> bool:
+        return self.cooldown_until.get(provider.name, 0.0) > time.monotonic()
+
+    def order(self) -> List[SearchProvider]:
+        """Weighted random pick among providers not cooling down, the others after it for failover"""
+        ready = [p for p in self.providers if not self.cooling(p) and p.weight > 0]
+        first = random.choices(ready, weights=[p.weight for p in ready])[0] if ready else None
+        rest = sorted((p for p in self.providers if p is not first), key=lambda p: (self.cooling(p), -p.weight))
+        return ([first] if first else []) + rest
+
+    async def _call(self, provider: SearchProvider, session, limiter, query, ctx, num, last: bool):
+        # Failover is only worth it when another provider is left to ask
+        max_retries = None if last else settings.SEARCH_FAILOVER_RETRIES
+        try:
+            status, results = await provider.search(session, limiter, query, ctx, num, max_retries=max_retries)
+        except Exception:
+            status, results = "error", []
+        count(SEARCH_PROVIDER_CALLS, provider=provider.name, outcome=status)
+        if status == "throttled":
+            self.cooldown_until[provider.name] = time.monotonic() + settings.SEARCH_PROVIDER_COOLDOWN_SEC
+        return status, results
+
+    async def _race(self, pair: List[SearchProvider], session, limiter, query, ctx, num,
+                    last: bool) -> Tuple[Optional[list], int]:
+        """First non-empty answer of two providers queried at once (None when neither answered), and the number of
+        billed queries among the calls that completed"""
+        tasks = {asyncio.ensure_future(self._call(p, session, limiter, query, ctx, num, last=last)): p for p in pair}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    status, results = t.result()
+                    if status == "ok" and results:
+                        count(SEARCH_PROVIDER_CALLS, provider=tasks[t].name, outcome="race_won")
+                        return results, self._billed(tasks, [x for x in tasks if x.done()])
+            answered = [t.result()[1] for t in tasks if t.result()[0] == "ok"]
+            return (answered[0] if answered else None), self._billed(tasks, list(tasks))
+        finally:
+            for t in pending:
+                t.cancel()
+
+    @staticmethod
+    def _billed(tasks: dict, done: list) -> int:
+        return sum(tasks[t].billed for t in done if not t.cancelled() and t.result()[0] == "ok")
+
+    async def search(self, session, limiter: RPSLimiter, query: str, ctx: dict, num: int = 10,
+                     race: bool = False) -> Tuple[list, int]:
+        """Raw results of the first provider that answers, and the number of billed queries spent"""
+        order = self.order()
+        billed = 0
+        if race and len(order) > 1:
+            pair, order = order[:2], order[2:]
+            # With no provider left behind them, the racers get the full retry budget
+            results, billed = await self._race(pair, session, limiter, query, ctx, num, last=not order)
+            if results is not None:
+                return results, billed
+        for i, provider in enumerate(order):
+            status, results = await self._call(provider, session, limiter, query, ctx, num, last=i == len(order) - 1)
+            if status == "ok":
+                # Only answered (HTTP 200) queries are billed
+                return results, billed + provider.billed
+        return [], billed
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        return {p.name: {"weight": p.weight,
+                         "cooldown_sec": round(max(0.0, self.cooldown_until.get(p.name, 0.0) - now), 1)}
+                for p in self.providers}
+
+
+def build_provider(name: str, weight: float) -> SearchProvider:
+    if name == "serper":
+        return SerperProvider(weight=weight)
+    if name == "http":
+        return HTTPSearchProvider("http", settings.SEARCH_HTTP_URL, settings.SEARCH_HTTP_API_KEY,
+                                  key_header=settings.SEARCH_HTTP_KEY_HEADER,
+                                  results_key=settings.SEARCH_HTTP_RESULTS_KEY, weight=weight)
+    if name == "local":
+        return LocalIndexProvider(weight=weight)
+    raise ValueError(f"Unknown search provider: {name}")
+
+
+def build_router(spec: str) -> SearchRouter:
+    """SearchRouter from a spec such as "serper:3,http:1,local" (weight defaults to 1)"""
+    providers = []
+    for part in (spec or "serper").split(","):
+        name, _, weight = part.strip().partition(":")
+        if name:
+            providers.append(build_provider(name.strip().lower(), float(weight) if weight else 1.0))
+    return SearchRouter(providers)
+
+
+search_router = build_router(settings.SEARCH_PROVIDERS)
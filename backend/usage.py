@@ -0,0 +1,140 @@
+"""
+Per-job spend accounting (Serper queries, OpenAI tokens, crawl pages) and budget tracking
+"""
+import threading
+from typing import Optional
+
+from backend.config import settings
+
+
+BUDGET_ACTIONS = ("degrade", "pause")
+
+
+def tier_prices(tier: str):
+    """(prompt, completion) USD per 1K tokens of a model-cascade tier"""
+    if tier == "fast":
+        return settings.OPENAI_FAST_PROMPT_COST_PER_1K, settings.OPENAI_FAST_COMPLETION_COST_PER_1K
+    return settings.OPENAI_PROMPT_COST_PER_1K, settings.OPENAI_COMPLETION_COST_PER_1K
+
+
+class JobUsage:
+    def __init__(self, budget_usd: Optional[float] = None, budget_action: str = "degrade"):
+        if budget_action not in BUDGET_ACTIONS:
+            raise ValueError(f"Unsupported budget action: {budget_action}")
+        self.budget_usd = budget_usd
+        self.budget_action = budget_action
+        self.serper_queries = 0
+        self.openai_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.hedge_prompt_tokens = 0  # prompts re-sent by hedged duplicates, kept out of the tier totals
+        self.crawl_pages = 0
+        self.search_cache_hits = 0
+        self.llm_cache_hits = 0
+        self.saved_prompt_tokens = 0
+        self.saved_completion_tokens = 0
+        self.tier_tokens = {}  # tier -> [prompt, completion]
+        self.saved_tier_tokens = {}
+        self.hedge_tier_tokens = {}
+        self.degraded = False
+        self.paused = False
+        self.lock = threading.Lock()
+
+    # -------------------- Recording --------------------
+    def add_serper_query(self, n: int = 1):
+        with self.lock:
+            self.serper_queries += n
+
+    @staticmethod
+    def _add_tokens(tiers: dict, tier: str, prompt: int, completion: int):
+        t = tiers.setdefault(tier, [0, 0])
+        t[0] += prompt
+        t[1] += completion
+
+    def add_openai_call(self, usage: Optional[dict], tier: str = "main"):
+        prompt = int((usage or {}).get("prompt_tokens") or 0)
+        completion = int((usage or {}).get("completion_tokens") or 0)
+        hedge_prompt = int((usage or {}).get("hedge_prompt_tokens") or 0)
+        with self.lock:
+            self.openai_calls += 1
+            self.prompt_tokens += prompt
+            self.completion_tokens += completion
+            self._add_tokens(self.tier_tokens, tier, prompt, completion)
+            if hedge_prompt:
+                self.hedge_prompt_tokens += hedge_prompt
+                self._add_tokens(self.hedge_tier_tokens, tier, hedge_prompt, 0)
+
+    def add_search_cache_hit(self):
+        with self.lock:
+            self.search_cache_hits += 1
+
+    def add_llm_cache_hit(self, usage: Optional[dict], tier: str = "main"):
+        prompt = int((usage or {}).get("prompt_tokens") or 0)
+        completion = int((usage or {}).get("completion_tokens") or 0)
+        with self.lock:
+            self.llm_cache_hits += 1
+            self.saved_prompt_tokens += prompt
+            self.saved_completion_tokens += completion
+            self._add_tokens(self.saved_tier_tokens, tier, prompt, completion)
+
+    def add_crawl_pages(self, n: int):
+        with self.lock:
+            self.crawl_pages += n
+
+    # -------------------- Cost --------------------
+    @staticmethod
+    def _cost(serper_queries: int, tier_tokens: dict) -> float:
+        cost = serper_queries * settings.SERPER_COST_PER_QUERY
+        for tier, (prompt, completion) in tier_tokens.items():
+            prompt_price, completion_price = tier_prices(tier)
+            cost += prompt / 1000 * prompt_price + completion / 1000 * completion_price
+        return cost
+
+    def cost_usd(self) -> float:
+        return self._cost(self.serper_queries, self.tier_tokens) + self.hedge_cost_usd()
+
+    def hedge_cost_usd(self) -> float:
+        return self._cost(0, self.hedge_tier_tokens)
+
+    def savings_usd(self) -> float:
+        return self._cost(self.search_cache_hits, self.saved_tier_tokens)
+
+    def check_budget(self) -> str:
+        """Return 'ok', 'degrade' or 'pause' and latch the corresponding state"""
+        if self.budget_usd is None or self.paused:
+            return "pause" if self.paused else "ok"
+        if self.cost_usd() < self.budget_usd:
+            return "degrade" if self.degraded else "ok"
+        if self.budget_action == "pause":
+            self.paused = True
+            return "pause"
+        self.degraded = True
+        return "degrade"
+
+    def raise_budget(self, budget_usd: Optional[float]):
+        """New cap (None = unlimited) for a job paused on budget; clears the paused/degraded latches"""
+        with self.lock:
+            self.budget_usd = budget_usd
+            self.paused = False
+            self.degraded = False
+
+    def summary(self) -> dict:
+        with self.lock:
+            return {
+                "serper_queries": self.serper_queries,
+                "openai_calls": self.openai_calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "tokens_by_tier": {t: {"prompt": p, "completion": c} for t, (p, c) in self.tier_tokens.items()},
+                "hedge_prompt_tokens": self.hedge_prompt_tokens,
+                "crawl_pages": self.crawl_pages,
+                "search_cache_hits": self.search_cache_hits,
+                "llm_cache_hits": self.llm_cache_hits,
+                "cost_usd": round(self.cost_usd(), 4),
+                "hedge_cost_usd": round(self.hedge_cost_usd(), 4),
+                "cache_savings_usd": round(self.savings_usd(), 4),
+                "budget_usd": self.budget_usd,
+                "budget_action": self.budget_action,
+                "degraded": self.degraded,
+                "paused": self.paused,
+            }
@@ -0,0 +1,167 @@
+"""
+Local stand-ins for the Serper search API, the OpenAI chat endpoint and a farm of company websites.
+
+One aiohttp app serves all three:
+  POST /search                 Serper-compatible search (returns "organic")
+  POST /v1/chat/completions    OpenAI-compatible chat completion (JSON answer + usage)
+  GET  /*  via proxy           Fake company sites, routed on the Host header (use it as CRAWL_PROXY_URL); a third
+                               link their legal page from the home page, a third only list it in their sitemap
+                               and the rest have neither
+  GET  /__stats                Call counters
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+
+from aiohttp import web
+
+
+# -------------------- Synthetic companies --------------------
+def company_slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "", name.lower())
+
+
+def siren_for(i: int) -> str:
+    """Deterministic Luhn-valid 9-digit SIREN for company i"""
+    base = f"{(i * 7919 + 104729) % 100000000:08d}"
+    for check in range(10):
+        digits = [int(d) for d in base + str(check)]
+        total = 0
+        for pos, d in enumerate(digits):
+            if pos % 2 == 1:
+                d *= 2
+                if d > 9:
+                    d -= 9
+            total += d
+        if total % 10 == 0:
+            return base + str(check)
+    return base + "0"
+
+
+# -------------------- Mock server --------------------
+class MockProviders:
+    def __init__(self, latency_ms: float = 30, jitter_ms: float = 20, error_rate: float = 0.0,
+                 rate_429: float = 0.0, site_latency_ms: float = 10, seed: int = 7):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.site_latency_ms = site_latency_ms
+        self.rng = random.Random(seed)
+        self.stats = {"serper": 0, "openai": 0, "site": 0, "site_head": 0, "errors": 0, "throttled": 0}
+
+    async def _delay(self, base_ms: float):
+        await asyncio.sleep(max(0.0, base_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+    def _fault(self):
+        r = self.rng.random()
+        if r < self.rate_429:
+            self.stats["throttled"] += 1
+            return web.json_response({"error": "rate limited"}, status=429)
+        if r < self.rate_429 + self.error_rate:
+            self.stats["errors"] += 1
+            return web.json_response({"error": "upstream error"}, status=503)
+        return None
+
+    async def serper(self, request: web.Request):
+        self.stats["serper"] += 1
+        await self._delay(self.latency_ms)
+        fault = self._fault()
+        if fault is not None:
+            return fault
+        body = await request.json()
+        q = body.get("q", "")
+        name = re.sub(r'"|official website|website|site web|site officiel', " ", q).split()
+        slug = company_slug(" ".join(name[:2]))
+        organic = [
+            {"link": f"https://www.{slug}.com/", "title": f"{' '.join(name[:2])} - Official site",
+             "snippet": f"Welcome to {' '.join(name[:2])}."},
+            {"link": f"https://www.linkedin.com/company/{slug}", "title": "LinkedIn", "snippet": ""},
+            {"link": f"https://{slug}-consulting.net/", "title": f"{slug} consulting", "snippet": "Homonym"},
+            {"link": f"https://directory.example.org/{slug}", "title": "Directory", "snippet": "Listing"},
+        ]
+        return web.json_response({"organic": organic[:int(body.get("num", 10))]})
+
+    async def openai(self, request: web.Request):
+        self.stats["openai"] += 1
+        await self._delay(self.latency_ms * 3)
+        fault = self._fault()
+        if fault is not None:
+            return fault
+        body = await request.json()
+        user = body["messages"][-1]["content"]
+        m = re.search(r'name="([^"]*)"', user)
+        urls = re.findall(r'url="([^"]*)"', user)
+        if m is None:
+            content = '{"ok":true}'
+        else:
+            slug = company_slug(" ".join(m.group(1).split()[:2]))
+            chosen = next((u for u in urls if f"{slug}.com" in u), "")
+            dom = re.sub(r"^https?://(www\.)?", "", chosen).split("/")[0] if chosen else "null"
+            content = json.dumps({"index": 0, "company": m.group(1), "chosen_domain": dom,
+                                  "chosen_from_url": chosen, "found_domain": "null",
+                                  "confidence": "entity" if chosen else "null", "reason": "mock"})
+        prompt_tokens = sum(len(x["content"]) for x in body["messages"]) // 4
+        return web.json_response({
+            "choices": [{"message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                      "total_tokens": prompt_tokens + len(content) // 4},
+        })
+
+    async def site(self, request: web.Request):
+        self.stats["site_head" if request.method == "HEAD" else "site"] += 1
+        await self._delay(self.site_latency_ms)
+        host = request.host.split(":")[0]
+        path = request.path.rstrip("/")
+        m = re.match(r"^(?:www\.)?([a-z]+?)(\d+)", host)
+        if m is None or "-" in host:
+            return web.Response(status=404)
+        idx = int(m.group(2))
+        linked, in_sitemap = idx % 3 == 0, idx % 3 == 1
+        if path in ("", "/"):
+            legal = "<a href=\"/mentions-legales\">Mentions légales</a>" if linked else ""
+            html = f"<html><body><h1>{host}</h1>{legal}<a href=\"/about\">About</a></body></html>"
+        elif path in ("/mentions-legales", "/legal"):
+            html = f"<html><body>Société {host} — SIREN {siren_for(idx)} — RCS Paris</body></html>"
+        elif path == "/robots.txt":
+            sitemap = f"Sitemap: http://{host}/sitemap.xml\n" if in_sitemap else ""
+            return web.Response(text=f"User-agent: *\nAllow: /\n{sitemap}", content_type="text/plain")
+        elif path == "/sitemap.xml" and in_sitemap:
+            locs = "".join(f"<url><loc>http://{host}{p}</loc></url>" for p in ("/", "/about", "/legal"))
+            return web.Response(text=f"<?xml version=\"1.0\"?><urlset>{locs}</urlset>", content_type="application/xml")
+        else:
+            return web.Response(status=404, text="not found", content_type="text/html")
+        return web.Response(text=html, content_type="text/html")
+
+    async def stats_view(self, request: web.Request):
+        return web.json_response(self.stats)
+
+    async def reset(self, request: web.Request):
+        for k in self.stats:
+            self.stats[k] = 0
+        return web.json_response(self.stats)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/search", self.serper)
+        app.router.add_post("/v1/chat/completions", self.openai)
+        app.router.add_get("/__stats", self.stats_view)
+        app.router.add_post("/__reset", self.reset)
+        app.router.add_route("*", "/{tail:.*}", self.site)
+        return app
+
+
+def serve(port: int, **kwargs):
+    web.run_app(MockProviders(**kwargs).app(), host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the mock Serper/OpenAI/site server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    args = parser.parse_args()
+    serve(args.port, latency_ms=args.latency_ms, error_rate=args.error_rate, rate_429=args.rate_429)
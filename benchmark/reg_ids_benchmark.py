@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of registration ID extraction on large synthetic legal pages: the single-pass scanner behind
+extract_reg_ids against the previous one-regex-per-ID-type implementation.
+
+    python -m benchmark.reg_ids_benchmark --pages 200 --page-kb 100,400
+
+Reports ms/page and MB/s for both, and the pages whose SIREN/SIRET/KvK sets differ, as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("SERPER_API_KEY", "bench")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.enrichment_engine import (  # noqa: E402
+    SIREN_CORE, SIRET_CORE, _digits_only, extract_reg_ids, luhn_check
+)
+from benchmark.mock_servers import siren_for  # noqa: E402
+
+
+# -------------------- Previous implementation --------------------
+SIREN_RE = re.compile(rf"(?i)\b(?:siren|n°\s*siren|numero\s*siren|num\s*siren)\b[^0-9]{{0,20}}({SIREN_CORE})\b")
+SIRET_RE = re.compile(rf"(?i)\b(?:siret|n°\s*siret|numero\s*siret|num\s*siret)\b[^0-9]{{0,20}}({SIRET_CORE})\b")
+SIREN_FB = re.compile(rf"\b({SIREN_CORE})\b", re.IGNORECASE)
+SIRET_FB = re.compile(rf"\b({SIRET_CORE})\b", re.IGNORECASE)
+VAT_RE = re.compile(r"(?i)\b(?:VAT|TVA|USt-IdNr|Partita IVA|BTW|GST)\b[^A-Z0-9]{0,12}([A-Z0-9\-]{8,16})\b")
+KVK_RE = re.compile(r"(?i)\b(?:KvK|Kamer van Koophandel)\b[^0-9]{0,12}(\d{6,12})\b")
+
+
+def extract_reg_ids_multipass(text: str) -> dict:
+    out = {"siren": set(), "siret": set(), "vat": set(), "kvk": set()}
+    if not text:
+        return out
+    tnorm = text.replace("\u00A0", " ").replace("\u202F", " ")
+    for m in SIRET_RE.findall(tnorm) + SIRET_FB.findall(tnorm):
+        d = _digits_only(m)
+        if len(d) == 14 and luhn_check(d[:9]):
+            out["siret"].add(d)
+    for m in SIREN_RE.findall(tnorm) + SIREN_FB.findall(tnorm):
+        d = _digits_only(m)
+        if len(d) == 9 and luhn_check(d):
+            out["siren"].add(d)
+    if out["siret"] and not out["siren"]:
+        for siret in out["siret"]:
+            s9 = siret[:9]
+            if luhn_check(s9):
+                out["siren"].add(s9)
+    for m in VAT_RE.findall(tnorm):
+        out["vat"].add(m.strip().upper())
+    for m in KVK_RE.findall(tnorm):
+        out["kvk"].add(_digits_only(m))
+    return out
+
+
+# -------------------- Synthetic pages --------------------
+FILLER = [
+    "<p>", "</p>", "<div class=\"footer-col\">", "</div>", "<a href=\"/contact\">Contact</a>", "Société", "siège",
+    "social", "capital", "de", "10 000 €", "Tél. : 01 23 45 67 89", "Paris", "75008", "hébergeur", "OVH SAS",
+    "2 rue Kellermann", "59100", "Roubaix", "directeur", "de la publication", "©", "2024", "cookies",
+    "<script>var t=1712345678901;</script>", "données", "personnelles", "RGPD", "conditions", "générales",
+]
+
+
+def fr_vat(siren: str) -> str:
+    return f"FR{(12 + 3 * (int(siren) % 97)) % 97:02d}{siren}"
+
+
+def legal_block(rng: random.Random, i: int) -> str:
+    siren = siren_for(i)
+    spaced = f"{siren[:3]} {siren[3:6]} {siren[6:]}"
+    parts = [
+        f"RCS Paris {spaced}",
+        f"SIRET : {siren[:3]} {siren[3:6]} {siren[6:]} 00012",
+        f"N° TVA intracommunautaire : {fr_vat(siren)}",
+        f"TVA {fr_vat(siren)[:-1]}0",
+        f"KvK {rng.randint(10_000_000, 99_999_999)}",
+        f"VAT {siren} 00012",
+        f"KvK {siren} 00012",
+        f"SIREN:{siren}",
+    ]
+    return " ".join(rng.sample(parts, rng.randint(1, len(parts))))
+
+
+def synthetic_page(rng: random.Random, i: int, size_kb: int) -> str:
+    chunks, size = [], 0
+    target = size_kb * 1024
+    while size < target:
+        w = legal_block(rng, i) if rng.random() < 0.002 else rng.choice(FILLER)
+        chunks.append(w)
+        size += len(w) + 1
+    return " ".join(chunks)
+
+
+def timed(fn, pages, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for p in pages:
+            fn(p)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registration ID extraction benchmark")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--page-kb", default="100,400", help="comma-separated page sizes in KB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for kb in [int(x) for x in args.page_kb.split(",") if x.strip()]:
+        pages = [synthetic_page(rng, i, kb) for i in range(args.pages)]
+        mb = sum(len(p) for p in pages) / 1e6
+        old_sec = timed(extract_reg_ids_multipass, pages, args.repeat)
+        new_sec = timed(extract_reg_ids, pages, args.repeat)
+        diffs, vat_rejected = 0, 0
+        for p in pages:
+            old, new = extract_reg_ids_multipass(p), extract_reg_ids(p)
+            diffs += any(old[k] != new[k] for k in ("siren", "siret", "kvk"))
+            vat_rejected += len(old["vat"] - new["vat"])
+        print(json.dumps({
+            "page_kb": kb, "pages": len(pages),
+            "multipass_ms_per_page": round(1000 * old_sec / len(pages), 3),
+            "single_pass_ms_per_page": round(1000 * new_sec / len(pages), 3),
+            "multipass_mb_s": round(mb / old_sec, 1), "single_pass_mb_s": round(mb / new_sec, 1),
+            "speedup": round(old_sec / new_sec, 2),
+            "pages_with_different_ids": diffs, "vat_rejected_by_check_digits": vat_rejected,
+        }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
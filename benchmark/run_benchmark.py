@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for EnrichmentEngine.enrich_dataframe against local mock providers.
+
+    python -m benchmark.run_benchmark --rows 1000,10000 --latency-ms 30 --rate-429 0.01
+
+Reports rows/s, p50/p99 per-row latency, peak RSS and external call counts as JSON.
+No API keys or network access are needed.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import socket
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("SERPER_API_KEY", "bench")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd  # noqa: E402
+
+from backend.config import settings  # noqa: E402
+from backend.enrichment_engine import EnrichmentEngine  # noqa: E402
+from benchmark.mock_servers import serve, siren_for  # noqa: E402
+
+
+WORDS = ["Labs", "Foods", "Motors", "Studio", "Energie", "Logistics", "Textiles", "Robotics"]
+COUNTRIES = ["France", "Germany", "Spain", "Italy", "United Kingdom"]
+
+
+# -------------------- Helpers --------------------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Mock server did not start on port {port}")
+
+
+def http_json(url: str, method: str = "GET") -> dict:
+    req = urllib.request.Request(url, method=method, data=b"" if method == "POST" else None)
+    with urllib.request.urlopen(req, timeout=5) as r:
+        return json.loads(r.read())
+
+
+def synthetic_dataset(n: int, reg_fraction: float) -> pd.DataFrame:
+    reg_every = int(1 / reg_fraction) if reg_fraction > 0 else 0
+    return pd.DataFrame({
+        "Company": [f"Nova{i} {WORDS[i % len(WORDS)]}" for i in range(n)],
+        "Country": [COUNTRIES[i % len(COUNTRIES)] for i in range(n)],
+        "SIREN": [siren_for(i) if reg_every and i % reg_every == 0 else "" for i in range(n)],
+    })
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = min(len(s) - 1, max(0, int(round(q * (len(s) - 1)))))
+    return s[k]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class TimedEngine(EnrichmentEngine):
+    """Records wall time of every resolved row, from its first stage to its write (per-row tasks or pipeline)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.row_latencies = []
+        self._row_started = {}
+
+    async def pre_resolve(self, company, ctx):
+        self._row_started[id(ctx)] = time.perf_counter()
+        return await super().pre_resolve(company, ctx)
+
+    async def record_row(self, rec, res, *args, **kwargs):
+        t0 = self._row_started.pop(id(rec.ctx), None)
+        if t0 is not None:
+            self.row_latencies.append(time.perf_counter() - t0)
+        return await super().record_row(rec, res, *args, **kwargs)
+
+
+# -------------------- Benchmark --------------------
+async def run_once(rows: int, reg_fraction: float, base_url: str) -> dict:
+    df = synthetic_dataset(rows, reg_fraction)
+    http_json(f"{base_url}/__reset", method="POST")
+    engine = TimedEngine()
+    t0 = time.perf_counter()
+    out = await engine.enrich_dataframe(df)
+    elapsed = time.perf_counter() - t0
+    await engine.clients.close()
+    calls = http_json(f"{base_url}/__stats")
+    lat = engine.row_latencies
+    found = int((out["URL"].astype(str).str.len() > 0).sum())
+    return {
+        "rows": rows,
+        "elapsed_sec": round(elapsed, 3),
+        "rows_per_sec": round(rows / max(elapsed, 1e-9), 1),
+        "row_latency_p50_ms": round(1000 * percentile(lat, 0.50), 1),
+        "row_latency_p99_ms": round(1000 * percentile(lat, 0.99), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "found": found,
+        "external_calls": calls,
+        "stages": engine.job_metrics.summary()["stages"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline enrichment benchmark")
+    parser.add_argument("--rows", default="1000", help="comma-separated dataset sizes, e.g. 1000,10000,100000")
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--site-latency-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--reg-fraction", type=float, default=0.1, help="share of rows with a SIREN (legal crawl)")
+    parser.add_argument("--serp-rps", type=int, default=2000)
+    parser.add_argument("--serp-concurrency", type=int, default=settings.SERP_CONCURRENCY)
+    parser.add_argument("--openai-concurrency", type=int, default=settings.OPENAI_CONCURRENCY)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    port = free_port()
+    proc = multiprocessing.Process(target=serve, args=(port,), daemon=True, kwargs={
+        "latency_ms": args.latency_ms, "site_latency_ms": args.site_latency_ms,
+        "error_rate": args.error_rate, "rate_429": args.rate_429,
+    })
+    proc.start()
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_for_port(port)
+        settings.SERPER_SEARCH_URL = f"{base_url}/search"
+        settings.OPENAI_URL = f"{base_url}/v1/chat/completions"
+        settings.CRAWL_BASE_URL = "http://{domain}"
+        settings.CRAWL_PROXY_URL = base_url
+        settings.ENABLE_DNS_CHECK = False
+        settings.ENABLE_KNOWLEDGE_INDEX = False  # keep runs independent of previously learned results
+        settings.SERP_MAX_RPS = args.serp_rps
+        settings.SERP_CONCURRENCY = args.serp_concurrency
+        settings.OPENAI_CONCURRENCY = args.openai_concurrency
+
+        report = {"config": vars(args), "runs": []}
+        for n in [int(x) for x in args.rows.split(",") if x.strip()]:
+            result = asyncio.run(run_once(n, args.reg_fraction, base_url))
+            report["runs"].append(result)
+            print(json.dumps({k: v for k, v in result.items() if k != "stages"}), flush=True)
+    finally:
+        proc.terminate()
+        proc.join(timeout=5)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
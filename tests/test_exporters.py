@@ -0,0 +1,32 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("SERPER_API_KEY", "test")
+
+from backend.exporters import export_result  # noqa: E402
+
+
+def test_xlsx_round_trip_keeps_dates_and_plain_urls(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    df = pd.DataFrame({
+        "company": ["Acme", "Nova"],
+        "created": pd.to_datetime(["2024-01-02 03:04:05", None]),
+        "seen_at": pd.to_datetime(["2024-06-01 12:00:00", "2024-06-02 08:30:00"]).tz_localize("Europe/Paris"),
+        "website": ["https://acme.example/", "http://nova.example/about"],
+    })
+
+    paths = export_result(df, tmp_path, "out", "xlsx")
+
+    ws = openpyxl.load_workbook(paths["result"]).active
+    rows = list(ws.iter_rows(values_only=True))
+    assert rows[0] == ("company", "created", "seen_at", "website")
+    assert rows[1][1] == datetime(2024, 1, 2, 3, 4, 5)
+    assert rows[2][1] is None
+    assert rows[1][2] == datetime(2024, 6, 1, 12, 0, 0)
+    assert ws["B2"].number_format == "yyyy-mm-dd hh:mm:ss"
+    assert rows[1][3] == "https://acme.example/"
+    assert ws["D2"].hyperlink is None and ws["D3"].hyperlink is None